@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+SYLLABLES = [
+    'an', 'ber', 'ca', 'da', 'el', 'fi', 'go', 'ha', 'is', 'jo', 'ka', 'li', 'ma', 'ne', 'or', 'pe', 'qui', 'ra',
+    'son', 'ta', 'ul', 'vi', 'wen', 'xa', 'yo', 'zel'
+]
+LETTERS = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+
+
+def name_pool(size, rng, min_syllables=2, max_syllables=4):
+    """
+    Returns an array of distinct, capitalized names built from random syllables.
+    """
+    names = set()
+    while len(names) < size:
+        n_syllables = rng.integers(min_syllables, max_syllables + 1)
+        names.add(''.join(rng.choice(SYLLABLES, n_syllables)).capitalize())
+    return np.array(sorted(names), dtype=object)
+
+
+def add_typos(values, rate, rng):
+    """
+    Introduces a single random edit (insertion, deletion or substitution) into each string with probability rate.
+    """
+    values = values.copy()
+    for i in np.flatnonzero(rng.random(len(values)) < rate):
+        value = values[i]
+        position = rng.integers(0, len(value) + 1)
+        edit = rng.integers(0, 3)
+        if edit == 0 or len(value) < 2:
+            value = value[:position] + rng.choice(LETTERS) + value[position:]
+        elif edit == 1:
+            position = min(position, len(value) - 1)
+            value = value[:position] + value[position + 1:]
+        else:
+            position = min(position, len(value) - 1)
+            value = value[:position] + rng.choice(LETTERS) + value[position + 1:]
+        values[i] = value
+    return values
+
+
+def generate_people(left_size, right_size, duplicate_rate=0.5, typo_rate=0.2, seed=0):
+    """
+    Generates a population of person-like records, along with a set of new records of which some are (possibly
+    mistyped) copies of population records.
+
+    Parameters
+    ----------
+    left_size : int
+        Number of population records.
+    right_size : int
+        Number of new records.
+    duplicate_rate : float, default 0.5
+        Fraction of new records which are copies of a population record.
+    typo_rate : float, default 0.2
+        Probability that each name field of a copied record contains a typo.
+    seed : int, default 0
+        Seed for the random number generator; the same seed always produces the same records.
+
+    Returns
+    -------
+    tuple of three DataFrames : population records (identified by unique_id), new records (identified by new_id),
+        and the true links between them (unique_id and new_id).
+    """
+    rng = np.random.default_rng(seed)
+    first_names = name_pool(max(50, int(left_size ** 0.5)), rng)
+    last_names = name_pool(max(100, int(left_size ** 0.6)), rng)
+
+    def people(size):
+        return pd.DataFrame({
+            'first_name': rng.choice(first_names, size),
+            'last_name': rng.choice(last_names, size),
+            'dob': pd.to_datetime('1940-01-01') + pd.to_timedelta(rng.integers(0, 60 * 365, size), unit='D'),
+            'ssn': rng.integers(100000000, 999999999, size),
+            'zip': np.char.zfill(rng.integers(0, 100000, size).astype(str), 5).astype(object),
+        })
+
+    left = people(left_size)
+    left.insert(0, 'unique_id', np.arange(left_size))
+
+    right = people(right_size)
+    duplicates = rng.random(right_size) < duplicate_rate
+    sources = rng.integers(0, left_size, duplicates.sum())
+    copies = left.iloc[sources].drop('unique_id', axis=1).reset_index(drop=True)
+    for field in ['first_name', 'last_name']:
+        copies[field] = add_typos(copies[field].to_numpy(dtype=object), typo_rate, rng)
+    right.loc[duplicates, copies.columns] = copies.to_numpy()
+    right.insert(0, 'new_id', np.arange(1000000000, 1000000000 + right_size))
+
+    truth = pd.DataFrame({'unique_id': sources, 'new_id': right['new_id'].to_numpy()[duplicates]})
+    return left, right, truth
@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import platform
+import subprocess
+import time
+import numpy as np
+import pandas as pd
+from matchstick import Matcher, MatchService
+from matchstick.match import peak_memory_mb
+from .generate import generate_people
+
+LEVENSHTEIN_FIELDS = [
+    {'field_name': 'first_name', 'precision': 1},
+    {'field_name': 'last_name', 'precision': 1},
+]
+MATCH_CRITERIA = [
+    {'type_id': 1, 'method': 'exact_match', 'fields': ['ssn']},
+    {'type_id': 2, 'method': 'exact_match', 'fields': ['first_name', 'last_name', 'dob']},
+    {'type_id': 3, 'method': 'function', 'function': lambda row: row['first_name'][:1] + row['last_name'] + row['zip']},
+    {'type_id': 4, 'method': 'levenshtein', 'fields': LEVENSHTEIN_FIELDS, 'blocking': 'dob'},
+]
+# Number of concurrent clients, each sending single records in turn, generating load for the match service.
+SERVICE_CLIENTS = 64
+# Beyond this many record pairs, benchmarks comparing every pair are skipped.
+MAX_CROSS_PAIRS = 10 ** 8
+
+
+def no_setup(matcher):
+    return None
+
+
+def matched(matcher):
+    return matcher.create_matches(MATCH_CRITERIA)
+
+
+def bench_match_on_field(matcher, _):
+    return {'pairs': len(matcher.match_on_field(['last_name', 'dob']))}
+
+
+def bench_match_on_function(matcher, _):
+    return {'pairs': len(matcher.match_on_function(lambda row: row['first_name'][:1] + row['last_name'] + row['zip']))}
+
+
+def bench_levenshtein(matcher, _):
+    candidates = matcher._candidate_pairs(LEVENSHTEIN_FIELDS, 'dob')
+    return {
+        'candidate_pairs': len(candidates[0]),
+        'pairs': len(matcher.levenshtein(LEVENSHTEIN_FIELDS, blocking='dob'))
+    }
+
+
+def bench_levenshtein_unblocked(matcher, _):
+    candidates = matcher._candidate_pairs(LEVENSHTEIN_FIELDS)
+    return {
+        'candidate_pairs': len(candidates[0]),
+        'pairs': len(matcher.levenshtein(LEVENSHTEIN_FIELDS))
+    }
+
+
+def bench_levenshtein_symspell(matcher, _):
+    candidates = matcher._searched_pairs(LEVENSHTEIN_FIELDS, None, 'symspell')
+    return {
+        'candidate_pairs': len(candidates[0]),
+        'pairs': len(matcher.levenshtein(LEVENSHTEIN_FIELDS, engine='symspell'))
+    }
+
+
+def bench_phonetic(matcher, _):
+    return {'pairs': len(matcher.phonetic(['first_name', 'last_name'], 'metaphone'))}
+
+
+def bench_jaro_winkler(matcher, _):
+    fields = [{'field_name': 'first_name', 'threshold': 0.9}, {'field_name': 'last_name', 'threshold': 0.9}]
+    return {'pairs': len(matcher.jaro_winkler(fields, blocking='dob'))}
+
+
+def bench_ngram_cosine(matcher, _):
+    return {'pairs': len(matcher.ngram_cosine(['first_name', 'last_name'], 0.8, top_n=5))}
+
+
+def bench_create_matches(matcher, _):
+    result = matcher.create_matches(MATCH_CRITERIA)
+    return {'candidate_pairs': int(result.stats['candidate_pairs'].sum()), 'pairs': len(result)}
+
+
+def prepared_lookup(matcher):
+    matcher.left_index.prepare(MATCH_CRITERIA, lookup=True)
+    return matcher.right_data.to_dict('records')
+
+
+def bench_match_one(matcher, records):
+    # Each record is timed on its own, so that the latency of single lookups can be compared against a target.
+    latencies = []
+    pairs = 0
+    for record in records:
+        start = time.perf_counter()
+        pairs += len(matcher.match_one(record, MATCH_CRITERIA))
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if latencies else (0.0, 0.0)
+    return {'pairs': pairs, 'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+
+def bench_service(matcher, records):
+    # Clients wait for the matches of each record before sending the next, so that latency includes coalescing.
+    async def client(service, client_records, latencies):
+        pairs = 0
+        for record in client_records:
+            start = time.perf_counter()
+            pairs += len(await service.match_one(record))
+            latencies.append(time.perf_counter() - start)
+        return pairs
+
+    async def load():
+        latencies = []
+        async with MatchService(matcher, MATCH_CRITERIA) as service:
+            pairs = await asyncio.gather(*(
+                client(service, records[i::SERVICE_CLIENTS], latencies) for i in range(SERVICE_CLIENTS)
+            ))
+        return sum(pairs), service.batches, latencies
+
+    pairs, batches, latencies = asyncio.run(load())
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if latencies else (0.0, 0.0)
+    return {'pairs': pairs, 'batches': batches, 'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+
+def bench_unique_matches(matcher, result):
+    return {'pairs': len(result.unique_matches)}
+
+
+def bench_unmatched(matcher, result):
+    return {'unmatched': len(matcher.unmatched(result))}
+
+
+# Each benchmark is a setup step, which is not timed, followed by the timed benchmark itself.
+BENCHMARKS = {
+    'match_on_field': (no_setup, bench_match_on_field),
+    'match_on_function': (no_setup, bench_match_on_function),
+    'levenshtein': (no_setup, bench_levenshtein),
+    'levenshtein_unblocked': (no_setup, bench_levenshtein_unblocked),
+    'levenshtein_symspell': (no_setup, bench_levenshtein_symspell),
+    'phonetic': (no_setup, bench_phonetic),
+    'jaro_winkler': (no_setup, bench_jaro_winkler),
+    'ngram_cosine': (no_setup, bench_ngram_cosine),
+    'create_matches': (no_setup, bench_create_matches),
+    'match_one': (prepared_lookup, bench_match_one),
+    'service': (prepared_lookup, bench_service),
+    'unique_matches': (matched, bench_unique_matches),
+    'unmatched': (matched, bench_unmatched),
+}
+
+
+def measure(name, left, right):
+    """
+    Runs a single benchmark, returning its wall time, peak memory and any counts it reports.
+    """
+    setup, benchmark = BENCHMARKS[name]
+    matcher = Matcher(left, 'unique_id', right, 'new_id')
+    state = setup(matcher)
+    rss_before = peak_memory_mb()
+    start = time.perf_counter()
+    counts = benchmark(matcher, state)
+    wall_seconds = time.perf_counter() - start
+    rss_after = peak_memory_mb()
+    return dict(counts, wall_seconds=wall_seconds, peak_rss_mb=rss_after, rss_growth_mb=rss_after - rss_before)
+
+
+def _measure_in_child(connection, name, left, right):
+    try:
+        connection.send(measure(name, left, right))
+    except Exception as e:
+        connection.send({'error': repr(e)})
+    connection.close()
+
+
+def measure_isolated(name, left, right):
+    """
+    Runs a benchmark in a forked process where possible, so that its peak memory is not hidden by that of earlier
+    benchmarks.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return measure(name, left, right)
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_in_child, args=(sender, name, left, right))
+    process.start()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def metadata():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def run(sizes, benchmarks, right_fraction=0.1, duplicate_rate=0.5, typo_rate=0.2, seed=0):
+    """
+    Runs each benchmark against synthetic data of each size.
+
+    Returns
+    -------
+    list of dictionaries : One per benchmark and size.
+    """
+    results = []
+    for size in sizes:
+        right_size = max(1, int(size * right_fraction))
+        left, right, _ = generate_people(size, right_size, duplicate_rate, typo_rate, seed)
+        for name in benchmarks:
+            result = {'benchmark': name, 'left_size': size, 'right_size': right_size}
+            if name == 'levenshtein_unblocked' and size * right_size > MAX_CROSS_PAIRS:
+                result['skipped'] = True
+            else:
+                result.update(measure_isolated(name, left, right))
+            results.append(result)
+            print(format_result(result))
+    return results
+
+
+def format_result(result, baseline=None):
+    if result.get('skipped') or 'error' in result:
+        return '{:<24} {:>9} {:>9}  {}'.format(
+            result['benchmark'],
+            result['left_size'],
+            result['right_size'],
+            'skipped' if result.get('skipped') else result['error']
+        )
+    line = '{:<24} {:>9} {:>9} {:>10.3f}s {:>9.1f}MB'.format(
+        result['benchmark'],
+        result['left_size'],
+        result['right_size'],
+        result['wall_seconds'],
+        result['peak_rss_mb']
+    )
+    if 'candidate_pairs' in result:
+        line += ' {:>12} candidates'.format(result['candidate_pairs'])
+    if 'p99_ms' in result:
+        line += ' {:>8.2f}ms p50 {:>8.2f}ms p99'.format(result['p50_ms'], result['p99_ms'])
+    if baseline is not None and baseline.get('wall_seconds'):
+        line += '  {:.2f}x baseline'.format(result['wall_seconds'] / baseline['wall_seconds'])
+    return line
+
+
+def compare(results, baseline_path):
+    """
+    Prints the wall time of each result relative to the matching result within a previous output file.
+    """
+    with open(baseline_path) as f:
+        baseline = {
+            (result['benchmark'], result['left_size'], result['right_size']): result
+            for result in json.load(f)['results']
+        }
+    print('Compared to {}:'.format(baseline_path))
+    for result in results:
+        key = (result['benchmark'], result['left_size'], result['right_size'])
+        print(format_result(result, baseline.get(key)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks matchstick against synthetic person records, eg "
+                    "python -m benchmarks.run --sizes 1000 10000 --output results.json"
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Numbers of population (left) records to benchmark, up to 1000000.")
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--right-fraction', type=float, default=0.1,
+                        help="Number of new (right) records, as a fraction of the population.")
+    parser.add_argument('--duplicate-rate', type=float, default=0.5)
+    parser.add_argument('--typo-rate', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Path of a JSON file to which results are written.")
+    parser.add_argument('--baseline', help="Path of a previous JSON output to compare results against.")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.benchmarks, args.right_fraction, args.duplicate_rate, args.typo_rate, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'metadata': metadata(), 'results': results}, f, indent=2)
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,7 @@
-from .match import Matcher, MatchResult, crossjoin_dataframes, remove_duplicate_matches
+from .match import (
+    Matcher, MatchResult, crossjoin_dataframes, iter_crossjoin_dataframes, blockjoin_dataframes,
+    remove_duplicate_matches
+)
+from .service import MatchService
+from .index import LeftIndex, VectorizedFunction, intern_columns
+from .storage import ColumnarFile
@@ -0,0 +1,657 @@
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from .phonetic import ENCODERS
+from .search import ENGINES, NgramIndex, run_positions
+
+
+class VectorizedFunction(object):
+    """
+    Marks a function used as a matching key as vectorized: rather than being applied to each row in turn, it is
+    called once with the whole DataFrame, and returns the key for every record at once,
+    eg lambda data: data['first_name'].str[:1] + data['last_name'].str[:1]
+
+    Parameters
+    ----------
+    func : function, lambda, or other callable
+        Accepts a DataFrame and returns a Series or array with one value per row.
+    """
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, data):
+        return self.func(data)
+
+    def __eq__(self, other):
+        return isinstance(other, VectorizedFunction) and self.func == other.func
+
+    def __hash__(self):
+        return hash(self.func)
+
+
+class PhoneticKey(VectorizedFunction):
+    """
+    PhoneticKey is a matching key holding the phonetic code of a string field (see matchstick.phonetic), so that
+    names which sound alike, such as Smith and Smyth, can be matched exactly on their codes. Each distinct value is
+    encoded only once. Values without any letters have no code, and so are never matched.
+
+    Parameters
+    ----------
+    field_name : string
+    algorithm : string
+        Either 'soundex' or 'metaphone'.
+    """
+    def __init__(self, field_name, algorithm):
+        self.field_name = field_name
+        self.algorithm = algorithm
+
+    def __call__(self, data):
+        codes, uniques = pd.factorize(data[self.field_name])
+        encoder = ENCODERS[self.algorithm]
+        # Missing values (coded -1) take the trailing None.
+        encoded = np.array([encoder(value) for value in uniques] + [None], dtype=object)
+        return encoded[codes]
+
+    def __eq__(self, other):
+        return isinstance(other, PhoneticKey) and (self.field_name, self.algorithm) == (
+            other.field_name, other.algorithm
+        )
+
+    def __hash__(self):
+        return hash((PhoneticKey, self.field_name, self.algorithm))
+
+
+class JoinedText(VectorizedFunction):
+    """
+    JoinedText is a matching key holding the values of several string fields joined by spaces, eg a full name from
+    first_name and last_name. Missing values are left out; records missing every field are missing.
+
+    Parameters
+    ----------
+    fields : list of strings
+    """
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+
+    def __call__(self, data):
+        joined = None
+        for field in self.fields:
+            values = pd.Series(np.asarray(data[field], dtype=object), index=data.index)
+            if joined is None:
+                joined = values
+                continue
+            both = joined.notna() & values.notna()
+            joined = joined.where(joined.notna(), values)
+            joined[both] = joined[both] + ' ' + values[both]
+        return joined
+
+    def __eq__(self, other):
+        return isinstance(other, JoinedText) and self.fields == other.fields
+
+    def __hash__(self):
+        return hash((JoinedText, self.fields))
+
+
+def key_values(data, key):
+    """
+    Returns the values of a single matching key for every record in data.
+
+    Parameters
+    ----------
+    data : DataFrame
+    key : string, callable, or VectorizedFunction
+        Strings name a field within data. Callables are applied to each row of data, eg lambda row: row['ssn'][-4:]
+
+    Returns
+    -------
+    Series
+    """
+    if isinstance(key, VectorizedFunction):
+        return pd.Series(key(data), index=data.index)
+    if hasattr(key, '__call__'):
+        return data.apply(key, axis=1)
+    return data[key]
+
+
+def record_key(record, key):
+    """
+    Returns the value of a single matching key for one record held as a dictionary, as key_values would for a
+    DataFrame holding it, or None where the record has no value. Row functions are called with the dictionary
+    itself; vectorized functions with a DataFrame holding only the record.
+
+    Parameters
+    ----------
+    record : dictionary
+    key : string, callable, or VectorizedFunction
+
+    Returns
+    -------
+    Value of the key
+    """
+    if isinstance(key, PhoneticKey):
+        value = record.get(key.field_name)
+        return None if _missing(value) else ENCODERS[key.algorithm](value)
+    if isinstance(key, JoinedText):
+        values = [record.get(field) for field in key.fields]
+        values = [value for value in values if not _missing(value)]
+        return ' '.join(values) if values else None
+    if isinstance(key, VectorizedFunction):
+        value = np.asarray(key(pd.DataFrame([record])), dtype=object)[0]
+    elif hasattr(key, '__call__'):
+        value = key(record)
+    else:
+        value = record.get(key)
+    return None if _missing(value) else value
+
+
+def _missing(value):
+    return value is None or (np.ndim(value) == 0 and pd.isna(value))
+
+
+def function_key(match_type):
+    """
+    Returns the matching key described by a 'function' match type.
+    """
+    if match_type.get('vectorized'):
+        return VectorizedFunction(match_type['function'])
+    return match_type['function']
+
+
+def phonetic_keys(match_type):
+    """
+    Returns the matching keys described by a 'phonetic' match type.
+    """
+    return [PhoneticKey(field, match_type.get('algorithm', 'soundex')) for field in match_type['fields']]
+
+
+def text_key(fields):
+    """
+    Returns the matching key holding the text of the provided fields: the field itself, if there is only one.
+    """
+    if len(fields) == 1:
+        return fields[0]
+    return JoinedText(fields)
+
+
+def intern_columns(data, fields, vocabularies=None):
+    """
+    Returns a copy of data in which each of the provided fields is held as a Categorical: integer codes into a
+    vocabulary of the distinct values, so that each distinct value is stored, hashed and compared only once.
+
+    Parameters
+    ----------
+    data : DataFrame
+    fields : list of strings
+        Names of the fields to intern.
+    vocabularies : dictionary (optional), default None
+        Existing vocabulary (Index of values) for any of the fields, eg the categories of another dataset which has
+        already been interned. Values are encoded against it, with any values not yet present appended, so that
+        values held by both datasets share the same code.
+
+    Returns
+    -------
+    DataFrame
+    """
+    vocabularies = vocabularies or {}
+    columns = {}
+    for field in fields:
+        values = data[field]
+        vocabulary = vocabularies.get(field)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Values already encoded against the vocabulary (or an extension of it) are kept as they are.
+            if vocabulary is None or values.cat.categories[:len(vocabulary)].equals(vocabulary):
+                continue
+            values = decode_values(values)
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Index(uniques, tupleize_cols=False)
+        if vocabulary is None:
+            vocabulary = uniques
+        else:
+            vocabulary = vocabulary.append(uniques[vocabulary.get_indexer(uniques) < 0])
+        codes = np.where(codes >= 0, vocabulary.get_indexer(uniques)[codes], -1)
+        columns[field] = pd.Categorical.from_codes(codes, categories=vocabulary)
+    return data.assign(**columns)
+
+
+def decode_values(values):
+    """
+    Returns the original values of a Series interned by intern_columns.
+    """
+    return values.astype(values.cat.categories.dtype)
+
+
+def decode_columns(data, fields):
+    """
+    Returns data with each of the provided fields which it holds interned converted back to its original values.
+    """
+    columns = {
+        field: decode_values(data[field]) for field in fields
+        if field in data.columns and isinstance(data[field].dtype, pd.CategoricalDtype)
+    }
+    return data.assign(**columns) if columns else data
+
+
+def index_codes(index, values):
+    """
+    Returns the position of each value within index, or -1 where it is not present. Values held as a Categorical
+    are looked up once per category, rather than once per record.
+    """
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        codes = np.asarray(values.cat.codes)
+        return np.append(index.get_indexer(values.cat.categories), -1)[codes]
+    return index.get_indexer(values)
+
+
+def as_list(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class KeyIndex(object):
+    """
+    KeyIndex is a hash index over one or more key columns of the left dataset, mapping each distinct combination of
+    key values to the positions of the records which hold it. Records with a missing value in any key column are
+    not indexed, and so are never matched.
+
+    Parameters
+    ----------
+    keys : list of Series
+        Key values for each record in the left dataset, one Series per key column.
+    """
+    def __init__(self, keys):
+        # Keys are encoded one column at a time. After each column, the running combination of codes is re-encoded
+        # to consecutive integers, so that the combined code can never overflow however many columns are involved.
+        self.uniques = []
+        self.combined_uniques = []
+        codes = None
+        for values in keys:
+            column_codes, uniques = pd.factorize(values)
+            if isinstance(uniques.dtype, pd.CategoricalDtype):
+                uniques = uniques.astype(uniques.categories.dtype)
+            self.uniques.append(pd.Index(uniques, tupleize_cols=False))
+            if codes is None:
+                codes = column_codes
+                continue
+            combined = codes * len(uniques) + column_codes
+            combined[(codes < 0) | (column_codes < 0)] = -1
+            codes, combined_uniques = pd.factorize(combined)
+            codes[combined < 0] = -1
+            self.combined_uniques.append(pd.Index(combined_uniques))
+        # Records are grouped by code, so that those sharing a key occupy a contiguous run of self.order.
+        valid = codes >= 0
+        self.codes = codes
+        counts = np.bincount(codes[valid], minlength=codes.max() + 1 if valid.any() else 0)
+        self.order = np.argsort(np.where(valid, codes, -1), kind='stable')[len(codes) - valid.sum():]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def lookup(self, keys):
+        """
+        Returns the code of each combination of key values within this index, or -1 if it is not present.
+
+        Parameters
+        ----------
+        keys : list of Series
+            Key values for each record in the right dataset, in the same order as those used to build the index.
+
+        Returns
+        -------
+        numpy array of integers
+        """
+        codes = None
+        for i, values in enumerate(keys):
+            column_codes = index_codes(self.uniques[i], values)
+            if codes is None:
+                codes = column_codes
+                continue
+            combined = codes * len(self.uniques[i]) + column_codes
+            found = (codes >= 0) & (column_codes >= 0)
+            codes = np.where(found, self.combined_uniques[i - 1].get_indexer(combined), -1)
+        return codes
+
+    def pairs(self, keys):
+        """
+        Returns the positions of every pair of left and right records with equal key values, ordered by left
+        position, then by right position.
+
+        Parameters
+        ----------
+        keys : list of Series
+            Key values for each record in the right dataset.
+
+        Returns
+        -------
+        tuple of two numpy arrays : left positions and right positions
+        """
+        starts, counts = self._runs(keys)
+        return _expand_runs(self.order, starts, counts)
+
+    def self_pairs(self):
+        """
+        Returns the positions of every pair of distinct indexed records with equal key values, each pair given once
+        with the earlier record first, ordered by first position, then by second position.
+
+        Returns
+        -------
+        tuple of two numpy arrays : first positions and second positions
+        """
+        # Records sharing a key are held in order of position, so each is paired with those following it in its run.
+        run_stops = np.repeat(self.offsets[1:], np.diff(self.offsets))
+        starts = np.arange(len(self.order)) + 1
+        counts = run_stops - starts
+        firsts = np.repeat(self.order, counts)
+        seconds = self.order[run_positions(starts, counts)]
+        pair_order = np.lexsort((seconds, firsts))
+        return firsts[pair_order], seconds[pair_order]
+
+    def counts(self, keys):
+        """
+        Returns the number of left records with equal key values for each right record, without pairing them.
+        """
+        return self._runs(keys)[1]
+
+    def _runs(self, keys):
+        codes = self.lookup(keys)
+        found = codes >= 0
+        starts = np.zeros(len(codes), dtype=np.int64)
+        counts = np.zeros(len(codes), dtype=np.int64)
+        starts[found] = self.offsets[codes[found]]
+        counts[found] = self.offsets[codes[found] + 1] - starts[found]
+        return starts, counts
+
+    def expand(self, codes, right_positions):
+        """
+        Pairs each right position with every left record holding the corresponding code, returning the positions of
+        the pairs ordered by left position, then by right position.
+        """
+        starts = self.offsets[codes]
+        return _expand_runs(self.order, starts, self.offsets[codes + 1] - starts, right_positions)
+
+
+class LengthIndex(object):
+    """
+    LengthIndex orders the records of the left dataset by the length of a string field, so that records whose
+    lengths fall within a given range can be found without comparing against every record.
+
+    Parameters
+    ----------
+    lengths : numpy array of integers
+        Length of the string held by each record in the left dataset.
+    """
+    def __init__(self, lengths):
+        self.order = np.argsort(lengths, kind='stable')
+        self.sorted_lengths = lengths[self.order]
+
+    def pairs_within(self, shortest, longest):
+        """
+        Returns the positions of every pair of left and right records where the length of the left record lies
+        between the shortest and longest lengths given for the right record (inclusive), ordered by left position,
+        then by right position.
+
+        Parameters
+        ----------
+        shortest, longest : numpy arrays of integers
+            Bounds on the length of the left records paired with each record in the right dataset.
+
+        Returns
+        -------
+        tuple of two numpy arrays : left positions and right positions
+        """
+        starts, stops = self._bounds(shortest, longest)
+        return _expand_runs(self.order, starts, stops - starts)
+
+    def counts_within(self, shortest, longest):
+        """
+        Returns the number of left records whose lengths lie between the shortest and longest lengths given for
+        each right record, without pairing them.
+        """
+        starts, stops = self._bounds(shortest, longest)
+        return stops - starts
+
+    def _bounds(self, shortest, longest):
+        starts = np.searchsorted(self.sorted_lengths, shortest, side='left')
+        stops = np.maximum(starts, np.searchsorted(self.sorted_lengths, longest, side='right'))
+        return starts, stops
+
+
+def _expand_runs(order, starts, counts, owners=None):
+    """
+    Pairs each right record with the run of left records order[start:start + count] given for it, then sorts the
+    pairs by left position and right position. Runs belong to consecutive right records, unless the right position
+    of each run is given by owners.
+    """
+    if owners is None:
+        owners = np.arange(len(counts))
+    right_positions = np.repeat(owners, counts)
+    left_positions = order[run_positions(starts, counts)]
+    pair_order = np.lexsort((right_positions, left_positions))
+    return left_positions[pair_order], right_positions[pair_order]
+
+
+class LeftIndex(object):
+    """
+    LeftIndex holds structures derived from the left dataset which are needed to perform matching, such as hash
+    indexes of key values and the lengths of strings compared by Levenshtein distance. Structures are built the
+    first time they are needed, or up front for a given set of match criteria, and then reused for every
+    subsequent set of right records.
+
+    Because left_data is held alongside its indexes, a LeftIndex may be saved once and then loaded by each later run
+    in place of the original left_data. Function criteria and callable blocking keys must then be importable
+    (module-level) functions rather than lambdas, so that they can be pickled. Indexes saved by a version of
+    matchstick holding different structures cannot be loaded, and must be built again.
+
+    A LeftIndex may be shared by many threads matching at once. Structures are never changed once built, so they are
+    read without locking; only building a structure is locked, so that each is built once however many threads need
+    it. Preparing every structure up front means that no thread ever waits.
+
+    Parameters
+    ----------
+    left_data : DataFrame or list of dictionaries
+        Dataset that is being matched against (your "population" data)
+    match_criteria : list of dictionaries (optional), default None
+        If provided, every structure needed to perform matching with these criteria is built immediately.
+    """
+    # Changed whenever the structures held by a LeftIndex change, so that indexes saved beforehand are rejected.
+    FORMAT_VERSION = 1
+
+    def __init__(self, left_data, match_criteria=None):
+        if isinstance(left_data, pd.DataFrame):
+            self.left_data = left_data
+        else:
+            self.left_data = pd.DataFrame(left_data)
+        self.key_indexes = {}
+        self.strings = {}
+        self.length_indexes = {}
+        self.search_indexes = {}
+        self.ngram_indexes = {}
+        self.key_lookups = {}
+        self._lock = threading.RLock()
+        if match_criteria is not None:
+            self.prepare(match_criteria)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['format_version'] = self.FORMAT_VERSION
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self._format_version = state.pop('format_version', None)
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def __str__(self):
+        return "< LeftIndex: {} records; {} key indexes; {} string fields >".format(
+            len(self.left_data),
+            len(self.key_indexes),
+            len(self.strings)
+        )
+
+    def prepare(self, match_criteria, lookup=False):
+        """
+        Builds every structure needed to perform matching with the provided criteria.
+
+        Parameters
+        ----------
+        match_criteria : list of dictionaries
+            See Matcher.create_matches.
+        lookup : bool, default False
+            If True, the structures needed to match single records with these criteria (see Matcher.match_one) are
+            also built, so that not even the first record waits for them.
+        """
+        if lookup:
+            self._prepare_lookup(match_criteria)
+        for match_type in match_criteria:
+            if match_type['method'] == 'exact_match':
+                self.key_index(match_type['fields'])
+            elif match_type['method'] == 'function':
+                self.key_index([function_key(match_type)])
+            elif match_type['method'] == 'phonetic':
+                self.key_index(phonetic_keys(match_type))
+            elif match_type['method'] == 'ngram_cosine':
+                self.ngram_index(match_type['fields'], match_type.get('ngram_size', 3))
+            elif match_type['method'] in ['levenshtein', 'jaro_winkler']:
+                for field in match_type['fields']:
+                    self.length_index(field['field_name'])
+                    self.key_index([field['field_name']])
+                if match_type.get('engine', 'brute') != 'brute':
+                    field = min(match_type['fields'], key=lambda field: field['precision'])
+                    self.search_index(field['field_name'], match_type['engine'], field['precision'])
+            if match_type.get('blocking') is not None:
+                self.key_index(match_type['blocking'])
+
+    def _prepare_lookup(self, match_criteria):
+        for match_type in match_criteria:
+            if match_type['method'] == 'exact_match':
+                self.key_lookup(match_type['fields'])
+            elif match_type['method'] == 'function':
+                self.key_lookup([function_key(match_type)])
+            elif match_type['method'] == 'phonetic':
+                self.key_lookup(phonetic_keys(match_type))
+            elif match_type['method'] == 'levenshtein':
+                field = min(match_type['fields'], key=lambda field: field['precision'])
+                engine = match_type.get('engine', 'brute')
+                self.search_index(field['field_name'], 'symspell' if engine == 'brute' else engine, field['precision'])
+            if match_type.get('blocking') is not None:
+                self.key_lookup(match_type['blocking'])
+
+    def save(self, path):
+        """
+        Saves this index, along with left_data, to the provided file path.
+        """
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """
+        Loads an index previously written by LeftIndex.save.
+
+        Returns
+        -------
+        LeftIndex
+        """
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        if not isinstance(index, LeftIndex):
+            raise ValueError("File {} does not contain a LeftIndex.".format(path))
+        if index._format_version != LeftIndex.FORMAT_VERSION:
+            raise ValueError("File {} holds a LeftIndex saved by another version of matchstick.".format(path))
+        return index
+
+    def key_index(self, keys):
+        """
+        Returns a KeyIndex over the provided keys (field names and/or callables).
+        """
+        keys = tuple(as_list(keys))
+        return self._structure(
+            self.key_indexes, keys, lambda: KeyIndex([key_values(self.left_data, key) for key in keys])
+        )
+
+    def key_lookup(self, keys):
+        """
+        Returns a dictionary mapping each distinct combination of values of the provided keys, as a tuple, to its
+        code within key_index(keys), so that the records holding the values of a single record can be found
+        without building any arrays. Keys computed by a function are computed only for one record per code.
+        """
+        keys = tuple(as_list(keys))
+
+        def build():
+            key_index = self.key_index(keys)
+            # Records sharing a code share their key values, so the first record holding each code stands for all.
+            firsts = self.left_data.iloc[key_index.order[key_index.offsets[:-1]]]
+            columns = [np.asarray(key_values(firsts, key), dtype=object) for key in keys]
+            return dict(zip(zip(*columns), range(len(firsts))))
+        return self._structure(self.key_lookups, keys, build)
+
+    def string_values(self, field_name):
+        """
+        Returns the values of a field as an array of strings, along with the length of each string.
+        """
+        def build():
+            values = self.left_data[field_name].to_numpy(dtype=object)
+            return values, string_lengths(values)
+        return self._structure(self.strings, field_name, build)
+
+    def length_index(self, field_name):
+        """
+        Returns a LengthIndex over the lengths of the strings held in a field.
+        """
+        return self._structure(
+            self.length_indexes, field_name, lambda: LengthIndex(self.string_values(field_name)[1])
+        )
+
+    def search_index(self, field_name, engine, max_distance):
+        """
+        Returns a search index (see matchstick.search) over the distinct values of a string field, able to find
+        every value within max_distance of a query. Searches return positions within the uniques of
+        key_index([field_name]).
+        """
+        # Only some engines depend upon the distance searched for.
+        if engine == 'bktree':
+            max_distance = None
+        return self._structure(
+            self.search_indexes,
+            (field_name, engine, max_distance),
+            lambda: ENGINES[engine](self.key_index([field_name]).uniques[0].to_numpy(dtype=object), max_distance)
+        )
+
+    def ngram_index(self, fields, ngram_size):
+        """
+        Returns an NgramIndex (see matchstick.search) over the distinct text of the provided fields. Searches return
+        positions within the uniques of key_index([text_key(fields)]).
+        """
+        return self._structure(
+            self.ngram_indexes,
+            (tuple(fields), ngram_size),
+            lambda: NgramIndex(self.key_index([text_key(fields)]).uniques[0].to_numpy(dtype=object), ngram_size)
+        )
+
+    def _structure(self, structures, key, build):
+        """
+        Returns the structure held in structures under key, calling build to build it if it is not yet held.
+        """
+        structure = structures.get(key)
+        if structure is None:
+            with self._lock:
+                # Another thread may have built the structure while this one waited.
+                structure = structures.get(key)
+                if structure is None:
+                    structure = build()
+                    structures[key] = structure
+        return structure
+
+
+def string_lengths(values):
+    """
+    Returns the length of each of an array of strings, or -1 where the value is missing.
+    """
+    lengths = np.full(len(values), -1, dtype=np.int64)
+    present = ~pd.isna(values)
+    lengths[present] = np.fromiter(map(len, values[present]), dtype=np.int64, count=present.sum())
+    return lengths
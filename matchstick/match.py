@@ -1,7 +1,21 @@
-from functools import reduce
-from operator import and_
+from functools import partial
+import multiprocessing
+import sys
+import time
+import numpy as np
 import pandas as pd
 import Levenshtein
+try:
+    import resource
+except ImportError:
+    resource = None
+from .index import (
+    KeyIndex, LeftIndex, PhoneticKey, VectorizedFunction, as_list, decode_columns, function_key, index_codes,
+    intern_columns, key_values, phonetic_keys, record_key, string_lengths, text_key
+)
+from .phonetic import ENCODERS
+from .search import BOUNDED_LEVENSHTEIN, run_positions
+from .storage import ColumnarFile, all_columns, arrow_types, fetch_columns, read_data, write_parquet
 
 
 def crossjoin_dataframes(df1, df2, **kwargs):
@@ -21,14 +35,165 @@ def crossjoin_dataframes(df1, df2, **kwargs):
     -------
     DataFrame : Cartesian product of df1 and df2
     """
-    tmp1 = df1.copy()
-    tmp2 = df2.copy()
-    tmp1['__tmp'] = 1
-    tmp2['__tmp'] = 1
+    return pd.merge(df1, df2, how='cross', **kwargs)
 
-    product = pd.merge(tmp1, tmp2, on='__tmp', **kwargs).drop('__tmp', axis=1)
 
-    return product
+def iter_crossjoin_dataframes(df1, df2, max_rows=1000000, **kwargs):
+    """
+    Creates a cross-join (Cartesian product) between two DataFrames in blocks of at most max_rows rows, so that the
+    full product need never be held in memory at once. Neither DataFrame is copied. Concatenating the blocks gives
+    the same rows, in the same order, as crossjoin_dataframes; at least one block is always produced, so that an
+    empty product still has the joined columns.
+
+    Parameters
+    ----------
+    df1: DataFrame
+        First (left) DataFrame
+    df2 : DataFrame
+        Second (right) DataFrame
+    max_rows : int, default 1000000
+        Largest number of rows in any block.
+    kwargs : dictionary
+        Keyword arguments to be applied to each resulting DataFrame.
+
+    Returns
+    -------
+    Generator of DataFrames : Consecutive blocks of the Cartesian product of df1 and df2
+    """
+    if max_rows < 1:
+        raise ValueError("max_rows must be at least 1.")
+    if len(df1) == 0:
+        yield crossjoin_dataframes(df1, df2, **kwargs)
+    elif len(df2) <= max_rows:
+        # Each block pairs several left records with every right record...
+        step = max(1, max_rows // max(1, len(df2)))
+        for start in range(0, len(df1), step):
+            yield crossjoin_dataframes(df1.iloc[start:start + step], df2, **kwargs)
+    else:
+        # ...or, where there are too many right records for that, a single left record with some of them.
+        for left in range(len(df1)):
+            for start in range(0, len(df2), max_rows):
+                yield crossjoin_dataframes(df1.iloc[left:left + 1], df2.iloc[start:start + max_rows], **kwargs)
+
+
+def blockjoin_dataframes(df1, df2, blocking, **kwargs):
+    """
+    Joins two DataFrames on one or more blocking keys, producing only those pairs of records which share a block.
+    This is a restricted form of crossjoin_dataframes, useful when a full Cartesian product would be too large.
+    Blocks are found exactly as Matcher finds them, so records missing any blocking key are never paired. Neither
+    DataFrame is copied; only the rows paired are taken from each.
+
+    Parameters
+    ----------
+    df1: DataFrame
+        First (left) DataFrame
+    df2 : DataFrame
+        Second (right) DataFrame
+    blocking : string, callable, or list of strings and/or callables
+        Strings name a field present in both DataFrames. Callables are applied to each row of both DataFrames,
+        eg lambda row: row['last_name'][:1]. Records are paired only when every blocking key is equal.
+    kwargs : dictionary
+        Keyword arguments to be applied to the resulting DataFrame.
+
+    Returns
+    -------
+    DataFrame : Pairs of records from df1 and df2 which share all blocking keys, ordered by df1, then by df2
+    """
+    keys = as_list(blocking)
+    left_positions, right_positions = KeyIndex([key_values(df1, key) for key in keys]).pairs(
+        [key_values(df2, key) for key in keys]
+    )
+    return pd.merge(
+        df1.iloc[left_positions].reset_index(drop=True),
+        df2.iloc[right_positions].reset_index(drop=True),
+        left_index=True,
+        right_index=True,
+        **kwargs
+    )
+
+
+# Functions comparing a pair of strings for each method which compares fields, along with the type of their result.
+MEASURES = {
+    'levenshtein': (Levenshtein.distance, np.int64),
+    'jaro_winkler': (Levenshtein.jaro_winkler, np.float64),
+}
+
+# Measures which may stop computing a distance as soon as it exceeds a limit. Jaro-Winkler similarity is always
+# computed in full, since its bounded form may exclude pairs exactly at a threshold.
+BOUNDED_MEASURES = ['levenshtein'] if BOUNDED_LEVENSHTEIN else []
+
+
+def _compare_values(measure, left_values, right_values, limit=None):
+    """
+    Compares each pair of values by the given measure. If a limit is provided (for a measure in BOUNDED_MEASURES),
+    pairs found to be outside it are not compared in full, and their distance is reported as the limit + 1.
+    """
+    compare, dtype = MEASURES[measure]
+    if limit is not None:
+        compare = partial(compare, score_cutoff=limit)
+    return np.fromiter(map(compare, left_values, right_values), dtype=dtype, count=len(left_values))
+
+
+def _by_selectivity(fields, measure):
+    """
+    Returns fields ordered from that which admits the fewest pairs of records to that which admits the most: by
+    smallest precision (Levenshtein distance), or largest threshold (Jaro-Winkler similarity).
+    """
+    if measure == 'levenshtein':
+        return sorted(fields, key=lambda field: field['precision'])
+    return sorted(fields, key=lambda field: -field['threshold'])
+
+
+def _most_selective(fields, measure):
+    """
+    Returns the field which admits the fewest pairs of records; see _by_selectivity.
+    """
+    return _by_selectivity(fields, measure)[0]
+
+
+def _limit(field, measure):
+    if measure == 'levenshtein':
+        return field['precision']
+    return field['threshold']
+
+
+def _within_limit(field, measure, scores):
+    if measure == 'levenshtein':
+        return scores <= field['precision']
+    return scores >= field['threshold']
+
+
+def _covers(measure, scores, limits, limit):
+    """
+    Returns whether each score, computed subject to the corresponding limit (see _compare_values), may be reused
+    subject to the given limit: either it is exact, being within its own limit, or its own limit is no looser.
+    Unbounded scores have a limit of infinity (Levenshtein distance), or minus infinity (Jaro-Winkler similarity).
+    """
+    if measure == 'levenshtein':
+        return (scores <= limits) | (limits >= (np.inf if limit is None else limit))
+    return (scores >= limits) | (limits <= (-np.inf if limit is None else limit))
+
+
+def _length_bounds(field, measure, lengths):
+    """
+    Returns the shortest and longest lengths of the strings which could be within the limit of a field when compared
+    to strings of the given lengths. Levenshtein distance is at least the difference between two lengths. Jaro
+    similarity is at most (2 + r) / 3, where r is the shorter length divided by the longer, and the Winkler prefix
+    bonus adds at most 0.4 of the remainder, so Jaro-Winkler similarity is at most 0.8 + 0.2 * r.
+
+    Missing values (given a length of -1 by string_lengths) are never within the limit of any value, so are given
+    no lengths at all, and lie outside the bounds of every other length.
+    """
+    if measure == 'levenshtein':
+        shortest, longest = lengths - field['precision'], lengths + field['precision']
+    elif 5 * field['threshold'] - 4 <= 0:
+        shortest, longest = np.zeros_like(lengths), np.full_like(lengths, np.iinfo(np.int64).max)
+    else:
+        ratio = 5 * field['threshold'] - 4
+        # Bounds are widened slightly for rounding, so that no pair within the threshold is ever pruned.
+        shortest = np.ceil(lengths * ratio - 1e-9).astype(np.int64)
+        longest = np.floor(lengths / ratio + 1e-9).astype(np.int64)
+    return np.maximum(shortest, 0), np.where(lengths < 0, -1, longest)
 
 
 def remove_duplicate_matches(data, id_fields):
@@ -50,10 +215,190 @@ def remove_duplicate_matches(data, id_fields):
     assert isinstance(id_fields, list)
     for field in id_fields:
         assert field in data.columns
+    if len(data) == 0:
+        return data
+
+    # Rather than sorting every match, find the highest-priority match type within each pair of records in a
+    # single grouped pass over integer codes. Match types are ranked by sort order, with missing match types last.
+    priority, _ = pd.factorize(data['match_type'], sort=True)
+    priority[priority < 0] = priority.max() + 1
+    groups = _group_codes(data, id_fields)
+    n_groups = groups.max() + 1
+    best = np.full(n_groups, priority.max())
+    np.minimum.at(best, groups, priority)
+    candidates = np.flatnonzero(priority == best[groups])
+    # Where a pair has several matches of its highest-priority type, keep the first.
+    unique = np.full(n_groups, len(data))
+    np.minimum.at(unique, groups[candidates], candidates)
+    unique = np.sort(unique)
+    unique = unique[np.argsort(priority[unique], kind='stable')]
+    return data.iloc[unique]
+
+
+def _group_codes(data, fields):
+    """
+    Returns an integer code for each record, equal for records sharing the values of every field.
+    """
+    key = np.zeros(len(data), dtype=np.int64)
+    # Radixes are Python integers, so that checking them for overflow cannot itself overflow.
+    radix = 1
+    for field in fields:
+        values = data[field]
+        if pd.api.types.is_integer_dtype(values) and not values.hasnans and values.min() >= 0:
+            codes = values.to_numpy(dtype=np.int64)
+            n_codes = int(codes.max()) + 1
+        else:
+            codes, uniques = pd.factorize(values, use_na_sentinel=False)
+            n_codes = len(uniques)
+        if radix * n_codes >= 2 ** 62:
+            # Re-encode to consecutive integers before combining, so that the combined key cannot overflow.
+            key, uniques = pd.factorize(key)
+            radix = len(uniques)
+        if radix * n_codes >= 2 ** 62:
+            # Values too widely spread to combine with the key directly are re-encoded too.
+            codes, uniques = pd.factorize(values)
+            n_codes = len(uniques)
+        key = key * n_codes + codes
+        radix = radix * n_codes
+    return pd.factorize(key)[0]
+
+
+def _connected_components(sources, targets, n_nodes):
+    """
+    Returns a label for each of n_nodes nodes of the graph with the given edges, equal for nodes which are connected.
+    Each label is the smallest node within its component. Components are found by repeatedly hooking the root of
+    one end of every edge onto the smaller root of the other, then pointing every node directly at its root, so that
+    all edges are processed together in each round and only a few rounds are needed however many edges there are.
+    """
+    labels = np.arange(n_nodes)
+    while True:
+        source_labels, target_labels = labels[sources], labels[targets]
+        unresolved = source_labels != target_labels
+        if not unresolved.any():
+            return labels
+        smaller = np.minimum(source_labels[unresolved], target_labels[unresolved])
+        np.minimum.at(labels, source_labels[unresolved], smaller)
+        np.minimum.at(labels, target_labels[unresolved], smaller)
+        while True:
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+
+
+_worker_matcher = None
+_worker_criteria = None
+_worker_options = None
 
-    return data.sort_values('match_type').drop_duplicates(
-        subset=id_fields,
-        keep='first')
+
+def _initialize_worker(matcher, match_criteria, options):
+    global _worker_matcher, _worker_criteria, _worker_options
+    _worker_matcher = matcher
+    _worker_criteria = match_criteria
+    _worker_options = options
+
+
+def _match_shard(bounds):
+    start, stop = bounds
+    shard = _worker_matcher._right_subset(np.arange(start, stop))
+    positions, stats = shard._match_positions(_worker_criteria, **_worker_options)
+    return [(left_positions, right_positions + start) for left_positions, right_positions in positions], stats
+
+
+def _changed_positions(data, id_field, changes):
+    """
+    Returns the positions within data of records listed as inserted or updated.
+    """
+    if not changes:
+        return np.array([], dtype=np.int64)
+    for key in changes:
+        if key not in ['inserted', 'updated', 'deleted']:
+            raise ValueError("Changes must be listed as 'inserted', 'updated' or 'deleted', not {}.".format(key))
+    ids = list(changes.get('inserted', [])) + list(changes.get('updated', []))
+    positions = pd.Index(data[id_field]).get_indexer(ids)
+    if (positions < 0).any():
+        raise ValueError("Changed records not present in data: {}".format(
+            [record_id for record_id, position in zip(ids, positions) if position < 0]
+        ))
+    return np.unique(positions).astype(np.int64)
+
+
+def _select_top_k(left_positions, right_positions, scores, kept, kept_pairs, top_k):
+    """
+    Selects the best candidates for each right record, keeping only as many as it has room for given the number of
+    matches already kept.
+    """
+    # Pairs already matched by an earlier match type do not count twice.
+    pairs = left_positions * len(kept) + right_positions
+    new = ~np.isin(pairs, kept_pairs)
+    left_positions, right_positions, scores = left_positions[new], right_positions[new], scores[new]
+
+    best = _keep_best(left_positions, right_positions, scores, top_k - kept)
+    return left_positions[best], right_positions[best]
+
+
+def _keep_best(left_positions, right_positions, scores, room):
+    """
+    Returns the indexes of the candidates to keep: for each right record, the room[right_position] candidates with
+    the lowest scores, preferring those earliest in left_data amongst equal scores. Indexes are ordered by right
+    position, then by rank.
+    """
+    order = np.lexsort((left_positions, scores, right_positions))
+    right_positions = right_positions[order]
+    first = np.flatnonzero(np.r_[True, right_positions[1:] != right_positions[:-1]])
+    group_sizes = np.diff(np.r_[first, len(right_positions)])
+    rank = np.arange(len(right_positions)) - np.repeat(first, group_sizes)
+    return order[rank < room[right_positions]]
+
+
+def _best_values(right_codes, similarities, top_n):
+    """
+    Returns whether each pair of distinct values is amongst the top_n most similar to its right value, or tied with
+    the last of those.
+    """
+    if len(right_codes) == 0:
+        return np.zeros(0, dtype=bool)
+    order = np.lexsort((-similarities, right_codes))
+    sorted_codes, sorted_similarities = right_codes[order], similarities[order]
+    first = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    group_sizes = np.diff(np.r_[first, len(sorted_codes)])
+    cutoff = np.repeat(sorted_similarities[first + np.minimum(group_sizes, top_n) - 1], group_sizes)
+    best = np.zeros(len(right_codes), dtype=bool)
+    best[order] = sorted_similarities >= cutoff
+    return best
+
+
+STATS_COLUMNS = [
+    'type_id', 'method', 'wall_seconds', 'candidate_pairs', 'length_pruned', 'pairs_kept', 'peak_memory_delta_mb'
+]
+
+
+def _combine_stats(stats):
+    """
+    Combines statistics for a single match type across shards: counts and times are summed, and the largest
+    memory increase is kept.
+    """
+    combined = dict(stats[0])
+    for field in ['wall_seconds', 'candidate_pairs', 'length_pruned', 'pairs_kept']:
+        combined[field] = sum(shard_stats[field] for shard_stats in stats)
+    combined['peak_memory_delta_mb'] = max(shard_stats['peak_memory_delta_mb'] for shard_stats in stats)
+    return combined
+
+
+def peak_memory_mb():
+    """
+    Returns the peak resident memory of the current process in megabytes, or 0 where this is not available.
+    """
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS, and in kilobytes elsewhere.
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+CASCADES = [None, 'right', 'both']
+
+HOOK_EVENTS = ['on_criterion_start', 'on_criterion_end', 'on_chunk']
 
 
 class Matcher(object):
@@ -63,34 +408,85 @@ class Matcher(object):
 
     Parameters
     ----------
-    left_data : DataFrame or list of dictionaries
+    left_data : DataFrame, list of dictionaries, or path to a Parquet or Arrow file (or ColumnarFile)
         Dataset that is being matched against (your "population" data)
     left_id_field : string
         Name of the field which uniquely identifies records within left_data
-    right_data : DataFrame or list of dictionaries
-        Dataset that is being matched (your "new" data)
+    right_data : DataFrame, list of dictionaries, or path to a Parquet or Arrow file (or ColumnarFile)
+        Dataset that is being matched (your "new" data). May be None when right records are instead provided to
+        iter_matches.
     right_id_field : string
         Name of the field which uniquely identifies records within right_data
     :param suffixes: list of two strings, default ["_left", "_right"]
         Names applied to overlapping column names in left_data and right_data, respectively
+    left_index : LeftIndex (optional), default None
+        Prebuilt indexes on left_data, eg loaded using LeftIndex.load. The index holds its own copy of left_data,
+        so left_data may be None when an index is provided.
+    intern : list of strings (optional), default None
+        Fields used for matching, such as first_name and last_name, to hold as integer codes into a vocabulary of
+        distinct values shared by left_data and right_data (see intern_columns). Repeated values are then stored
+        once, and indexes are built and searched by code rather than by hashing every value. Values are decoded
+        wherever data is returned. When left_index is provided, left_data is used as held by the index, and only
+        right_data is interned (against the vocabulary of left_data, if it was interned before indexing).
+    columns : list of strings (optional), default None
+        When left_data or right_data is a file, the columns to read into memory for matching: every field used by
+        the match criteria (including those used by functions). Id fields are always read. Other columns are only
+        read for matched records, when data is requested from the results. If not provided, every column is read.
+
+    A Matcher is never changed by matching, so a single Matcher may be shared by many threads matching at once, each
+    passing its own right records to create_matches; see also LeftIndex. Hooks should be registered before the
+    Matcher is shared.
 
     """
-    def __init__(self, left_data, left_id_field, right_data, right_id_field, suffixes=None):
-        if isinstance(left_data, pd.DataFrame):
-            self.left_data = left_data
+    def __init__(self, left_data, left_id_field, right_data, right_id_field, suffixes=None, left_index=None,
+                 intern=None, columns=None):
+        self.left_source = None
+        self.right_source = None
+        if left_index is not None:
+            if isinstance(left_data, str):
+                left_data = ColumnarFile(left_data)
+            if left_data is not None and len(left_data) != len(left_index.left_data):
+                raise ValueError("Provided left_index was not built from left data.")
+            self.left_data = left_index.left_data
+            if isinstance(left_data, ColumnarFile):
+                # Columns not held by the index are read from the file when requested.
+                self.left_source = left_data
         else:
-            self.left_data = pd.DataFrame(left_data)
+            self.left_data, self.left_source = read_data(left_data, columns and [left_id_field] + list(columns))
         if left_id_field not in self.left_data.columns:
             raise ValueError("Field {} not present in left data.".format(left_id_field))
         self.left_id_field = left_id_field
-        if isinstance(right_data, pd.DataFrame):
-            self.right_data = right_data
+        if right_data is None:
+            self.right_data = pd.DataFrame(columns=[right_id_field])
         else:
-            self.right_data = pd.DataFrame(right_data)
+            self.right_data, self.right_source = read_data(right_data, columns and [right_id_field] + list(columns))
         if right_id_field not in self.right_data.columns:
             raise ValueError("Field {} not present in right data.".format(right_id_field))
+        if right_data is not None and right_id_field == left_id_field:
+            # Results hold both ids side by side; see deduplicate for matching a dataset against itself.
+            raise ValueError("left_id_field and right_id_field must differ, not both be {}.".format(left_id_field))
         self.right_id_field = right_id_field
+        self.interned = list(intern or [])
+        for field in self.interned:
+            if field not in self.left_data.columns:
+                raise ValueError("Field {} not present in left data.".format(field))
+        if self.interned:
+            if left_index is None:
+                self.left_data = intern_columns(self.left_data, self.interned)
+            vocabularies = {
+                field: self.left_data[field].cat.categories for field in self.interned
+                if isinstance(self.left_data[field].dtype, pd.CategoricalDtype)
+            }
+            self.right_data = intern_columns(
+                self.right_data, [field for field in self.interned if field in self.right_data.columns], vocabularies
+            )
         self.suffixes = suffixes or ['_left', '_right']
+        self.left_index = left_index or LeftIndex(self.left_data)
+        self.right_keys = {}
+        self.hooks = {}
+        self._right_index = None
+        # When deduplicating, the position within left_data of each record of right_data; see deduplicate.
+        self._self_positions = None
 
     def __str__(self):
         return "< MatchMaker: {} records identified by {}; {} records identified by {} >".format(
@@ -100,7 +496,8 @@ class Matcher(object):
             self.right_id_field
         )
 
-    def create_matches(self, match_criteria):
+    def create_matches(self, match_criteria, n_jobs=None, top_k=None, max_pairs=None, cascade=None,
+                       right_data=None):
         """
         Iterates through provided match criteria, linking records between left_data and right_data.
 
@@ -108,7 +505,30 @@ class Matcher(object):
         ----------
         match_criteria : list of dictionaries
             Each inner dictionary defines an individual match type, choosing from amongst several available
-            mechanisms - exact match, apply function, or Levenshtein distance.
+            mechanisms - exact match, apply function, phonetic code, Levenshtein distance, Jaro-Winkler similarity,
+            or n-gram cosine similarity. See validate_match_criteria.
+        n_jobs : int (optional), default None
+            Number of worker processes used to perform matching. right_data is split into shards, each of which is
+            matched against the whole of left_data by a worker. None or 1 performs matching in the current process;
+            -1 uses all available processors. Results are identical to those produced serially.
+        top_k : int (optional), default None
+            If provided, at most top_k matches are kept for each record in right_data; top_k=1 keeps only the best
+            match. Match types are considered in the order given, so once a right record has top_k matches it is
+            excluded from all later match types. Amongst matches of the same type, those with the smallest total
+            Levenshtein distance (or highest similarity) are preferred, followed by those earliest in left_data.
+        max_pairs : int (optional), default None
+            If provided, Levenshtein and Jaro-Winkler matching compare candidate pairs in blocks of at most max_pairs
+            pairs (see Matcher.levenshtein), and n-gram cosine matching scores texts in batches of the same size,
+            bounding memory use by the size of each block rather than the number of candidates.
+        cascade : string (optional), default None
+            If provided, records matched by a match type are excluded from every later match type, so that later
+            (typically more expensive) match types only consider the records still unmatched. 'right' excludes
+            matched records of right_data; 'both' also excludes matched records of left_data. Every match made by
+            the match type which first matches a record is kept. 'both' cannot be combined with n_jobs, since
+            shards of right_data would then depend upon one another.
+        right_data : DataFrame or list of dictionaries (optional), default None
+            If provided, these right records are matched in place of the right_data of this Matcher, which is left
+            unchanged, so that many threads may match their own right records against a shared Matcher at once.
 
         Returns
         -------
@@ -116,28 +536,684 @@ class Matcher(object):
             Contains information about the matches which were made between the two datasets.
 
         """
+        if right_data is not None:
+            return self._for_right(right_data).create_matches(match_criteria, n_jobs, top_k, max_pairs, cascade)
         self.validate_match_criteria(match_criteria)
-        results = []
-        for match_type in match_criteria:
-            type_id = match_type.get('type_id')
-            if match_type['method'] == 'exact_match':
-                match_type_result = self.match_on_field(match_type['fields'], type_id)
-            elif match_type['method'] == 'function':
-                match_type_result = self.match_on_function(match_type['function'], type_id)
-            elif match_type['method'] == 'levenshtein':
-                match_type_result = self.levenshtein(match_type['fields'], type_id)
-            results.append(match_type_result)
-        combined_results = pd.concat(results)
-        # Keep only the most important fields, then merge back original data.
-        # Given variety of possible match types and column name permutations, it is easier to
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be at least 1.")
+        if max_pairs is not None and max_pairs < 1:
+            raise ValueError("max_pairs must be at least 1.")
+        if cascade not in CASCADES:
+            raise ValueError("cascade must be one of {}, not {}.".format(CASCADES, cascade))
+        if cascade == 'both' and n_jobs is not None and n_jobs != 1:
+            raise ValueError("cascade='both' cannot be combined with n_jobs.")
+        options = {'top_k': top_k, 'max_pairs': max_pairs, 'cascade': cascade}
+        if n_jobs is None or n_jobs == 1:
+            positions, stats = self._match_positions(match_criteria, **options)
+        else:
+            positions, stats = self._match_positions_parallel(match_criteria, n_jobs, options)
+        results = [
+            pd.DataFrame({
+                'left_position': left_positions,
+                'right_position': right_positions,
+                'match_type': match_type.get('type_id')
+            })
+            for match_type, (left_positions, right_positions) in zip(match_criteria, positions)
+        ]
+        # Only the positions of matched records are kept. Original data is merged back when it is requested from
+        # the MatchResult. Given variety of possible match types and column name permutations, it is easier to
         # ignore intermediate fields generated during the match process itself. By showing the original data
         # and match type, sufficient information on the nature of each match should be available.
-        key_fields = [self.left_id_field, self.right_id_field, 'match_type']
-        match_results = combined_results[key_fields]
-        match_results = match_results.merge(self.left_data, on=self.left_id_field)
-        match_results = match_results.merge(self.right_data, on=self.right_id_field)
+        combined_results = pd.concat(results, ignore_index=True)
+        return MatchResult(
+            combined_results,
+            self.left_data,
+            self.left_id_field,
+            self.right_data,
+            self.right_id_field,
+            pd.DataFrame(stats, columns=STATS_COLUMNS),
+            self.interned,
+            self.left_source,
+            self.right_source,
+            self._self_positions is not None
+        )
+
+    def deduplicate(self, match_criteria, n_jobs=None, max_pairs=None):
+        """
+        Matches left_data against itself, to find records which are probably duplicates of one another. Each pair of
+        distinct records is compared only once, and no record is compared with itself, so that deduplicating takes
+        around half the work of matching left_data against a copy of itself. right_data is not used.
+
+        Parameters
+        ----------
+        match_criteria : list of dictionaries
+            See create_matches.
+        n_jobs : int (optional), default None
+            See create_matches.
+        max_pairs : int (optional), default None
+            See create_matches.
+
+        Returns
+        -------
+        MatchResult object
+            Contains each pair of duplicate records once, with the record coming first in left_data identified by
+            left_id_field, and the other by left_id_field suffixed as given by suffixes, eg unique_id_right. The
+            records are grouped into clusters of duplicates by MatchResult.clusters.
+        """
+        return self._for_self().create_matches(match_criteria, n_jobs=n_jobs, max_pairs=max_pairs)
+
+    def match_one(self, record, match_criteria):
+        """
+        Matches a single right record against left_data, answering from indexes built on left_data rather than
+        building any DataFrames, so that a record is matched in a few milliseconds however large left_data is.
+        Matches are those create_matches would make for a right_data holding only this record.
+
+        Exact, function and phonetic match types look up the record's key values in hash tables of the distinct
+        key values of left_data. Levenshtein match types search an index of the distinct values of their most
+        precise field (a symspell index, unless another engine is given), and n-gram cosine match types search
+        their n-gram index. Jaro-Winkler match types compare the record with every distinct value of their most
+        selective field whose length is close enough, and so are slower. Indexes are built the first time they are
+        needed, or up front by left_index.prepare(match_criteria, lookup=True).
+
+        Parameters
+        ----------
+        record : dictionary
+            Values of the fields used by match_criteria, eg {'first_name': 'Jake', 'last_name': 'Smyth'}. Row
+            functions are called with the dictionary itself.
+        match_criteria : list of dictionaries
+            See create_matches.
+
+        Returns
+        -------
+        list of tuples
+            The id of each matched record in left_data along with the match type, ordered by match type and then by
+            position within left_data.
+        """
+        self.validate_match_criteria(match_criteria)
+        left_ids = self.left_data[self.left_id_field].to_numpy()
+        matches = []
+        for match_type in match_criteria:
+            positions = self._lookup_positions(record, match_type)
+            if match_type.get('blocking') is not None:
+                positions = np.intersect1d(positions, self._lookup_keys(record, as_list(match_type['blocking'])))
+            type_id = match_type.get('type_id')
+            matches.extend((left_id, type_id) for left_id in left_ids[positions].tolist())
+        return matches
+
+    def _lookup_positions(self, record, match_type):
+        """
+        Returns the positions within left_data of the records matching a single record by a single match type,
+        ignoring any blocking keys.
+        """
+        if match_type['method'] == 'exact_match':
+            return self._lookup_keys(record, match_type['fields'])
+        if match_type['method'] == 'function':
+            return self._lookup_keys(record, [function_key(match_type)])
+        if match_type['method'] == 'phonetic':
+            return self._lookup_keys(record, phonetic_keys(match_type))
+        if match_type['method'] == 'ngram_cosine':
+            return self._lookup_text(record, match_type)
+        measure = match_type['method']
+        fields = _by_selectivity(match_type['fields'], measure)
+        values = [record_key(record, field['field_name']) for field in fields]
+        if any(value is None for value in values):
+            return np.array([], dtype=np.int64)
+        if measure == 'levenshtein':
+            engine = match_type.get('engine', 'brute')
+            search_index = self.left_index.search_index(
+                fields[0]['field_name'], 'symspell' if engine == 'brute' else engine, fields[0]['precision']
+            )
+            key_index = self.left_index.key_index([fields[0]['field_name']])
+            codes = np.asarray(search_index.search(values[0], fields[0]['precision']), dtype=np.int64)
+            counts = np.diff(key_index.offsets)[codes]
+            positions = np.sort(key_index.order[run_positions(key_index.offsets[codes], counts)])
+            fields, values = fields[1:], values[1:]
+        else:
+            shortest, longest = _length_bounds(fields[0], measure, np.array([len(values[0])]))
+            positions = np.sort(self.left_index.length_index(fields[0]['field_name']).pairs_within(
+                shortest, longest
+            )[0])
+        for field, value in zip(fields, values):
+            # Left records missing a value are never within the limit of the field, as for create_matches.
+            positions = positions[self.left_index.key_index([field['field_name']]).codes[positions] >= 0]
+            scores = self._record_distances(field['field_name'], positions, value, measure, _limit(field, measure))
+            positions = positions[_within_limit(field, measure, scores)]
+        return positions
+
+    def _lookup_keys(self, record, keys):
+        """
+        Returns the positions within left_data of the records sharing the values of every key with a single record.
+        """
+        code = self.left_index.key_lookup(keys).get(tuple(record_key(record, key) for key in keys))
+        if code is None:
+            return np.array([], dtype=np.int64)
+        key_index = self.left_index.key_index(keys)
+        # Records sharing a code are held in order of position.
+        return key_index.order[key_index.offsets[code]:key_index.offsets[code + 1]]
+
+    def _lookup_text(self, record, match_type):
+        """
+        Returns the positions within left_data of the records matching a single record by n-gram cosine similarity.
+        """
+        fields = match_type['fields']
+        text = record_key(record, text_key(fields))
+        if text is None:
+            return np.array([], dtype=np.int64)
+        ngram_index = self.left_index.ngram_index(fields, match_type.get('ngram_size', 3))
+        key_index = self.left_index.key_index([text_key(fields)])
+        _, codes, similarities = ngram_index.search(np.array([text], dtype=object), match_type['threshold'])
+        counts = np.diff(key_index.offsets)[codes]
+        positions = key_index.order[run_positions(key_index.offsets[codes], counts)]
+        similarities = np.repeat(similarities, counts)
+        if match_type.get('blocking') is not None:
+            # As for create_matches, the best matches are chosen from amongst those sharing every blocking key.
+            blocked = np.isin(positions, self._lookup_keys(record, as_list(match_type['blocking'])))
+            positions, similarities = positions[blocked], similarities[blocked]
+        if match_type.get('top_n') is not None:
+            best = _keep_best(
+                positions, np.zeros(len(positions), dtype=np.int64), 1 - similarities, np.array([match_type['top_n']])
+            )
+            positions = positions[best]
+        return np.sort(positions)
+
+    def _record_distances(self, field_name, positions, value, measure, limit):
+        """
+        Returns the Levenshtein distance (or Jaro-Winkler similarity) between a single value and that held in a field
+        by each of the given records of left_data, comparing each distinct left value only once. Distances beyond
+        the limit are bounded, as for _compare_values.
+        """
+        key_index = self.left_index.key_index([field_name])
+        codes, inverse = np.unique(key_index.codes[positions], return_inverse=True)
+        left_values = key_index.uniques[0].to_numpy(dtype=object)[codes]
+        scores = _compare_values(
+            measure, left_values, [value] * len(codes), limit if measure in BOUNDED_MEASURES else None
+        )
+        return scores[inverse.reshape(-1)]
+
+    def iter_matches(self, match_criteria, right_chunks):
+        """
+        Matches successive chunks of right records against left_data, yielding the results for each chunk in turn.
+        Only one chunk need be held in memory at a time, and indexes built on left_data are reused for every chunk.
+
+        Parameters
+        ----------
+        match_criteria : list of dictionaries
+            See create_matches.
+        right_chunks : iterable of DataFrames or lists of dictionaries
+            Each chunk contains right records identified by right_id_field,
+            eg pd.read_csv('new_data.csv', chunksize=100000)
+
+        Returns
+        -------
+        Generator of MatchResult objects
+            One per chunk, containing the matches made between that chunk and left_data.
+        """
+        self.validate_match_criteria(match_criteria)
+        for chunk_number, right_data in enumerate(right_chunks):
+            result = self._for_right(right_data).create_matches(match_criteria)
+            self._call_hooks('on_chunk', chunk_number, result.stats)
+            yield result
+
+    def update_matches(self, previous, match_criteria, left_changes=None, right_changes=None, top_k=None,
+                       cascade=None):
+        """
+        Updates the results of an earlier run after records have been inserted, updated or deleted, re-matching only
+        those records which have changed. The result is identical to that of running create_matches afresh.
+
+        This Matcher must hold the current left_data and right_data, and previous must have been produced by
+        create_matches (or update_matches) using the same match criteria, top_k and cascade. Each match type must
+        have a distinct type_id.
+
+        ngram_cosine weighs n-grams by their frequency within left_data, so any change to left_data may alter any of
+        its matches: such match types are then performed afresh, as is every match type if top_k or cascade is
+        provided. Every match type is likewise performed afresh if cascade is 'both', since then any change may alter
+        which records every later match type considers.
+
+        Parameters
+        ----------
+        previous : MatchResult
+            Results of the earlier run.
+        match_criteria : list of dictionaries
+            See create_matches.
+        left_changes : dictionary (optional), default None
+            Ids of records in left_data which have changed since the earlier run, under any of the keys 'inserted',
+            'updated' and 'deleted', eg {'inserted': [104], 'deleted': [101]}
+        right_changes : dictionary (optional), default None
+            Ids of records in right_data which have changed since the earlier run, as for left_changes.
+        top_k : int (optional), default None
+            See create_matches.
+        cascade : string (optional), default None
+            See create_matches.
+
+        Returns
+        -------
+        MatchResult object
+        """
+        self.validate_match_criteria(match_criteria)
+        if cascade not in CASCADES:
+            raise ValueError("cascade must be one of {}, not {}.".format(CASCADES, cascade))
+        type_ids = [match_type.get('type_id') for match_type in match_criteria]
+        if len(set(type_ids)) != len(type_ids):
+            raise ValueError("Each match type must have a distinct type_id to update matches.")
+        left_changed = _changed_positions(self.left_data, self.left_id_field, left_changes)
+        right_changed = _changed_positions(self.right_data, self.right_id_field, right_changes)
+        pairs = previous.pairs
+        old_left = pd.Index(self.left_data[self.left_id_field]).get_indexer(pairs[self.left_id_field])
+        old_right = pd.Index(self.right_data[self.right_id_field]).get_indexer(pairs[self.right_id_field])
+
+        # Deleting a record from left_data changes it as much as inserting or updating one.
+        left_deleted = bool(left_changes and list(left_changes.get('deleted', []))) or (old_left < 0).any()
+        rerun = []
+        if len(left_changed) or left_deleted:
+            rerun = [i for i, match_type in enumerate(match_criteria) if match_type['method'] == 'ngram_cosine']
+        # Matches of every type for each right record depend on those of earlier types.
+        coupled = top_k is not None or cascade is not None
+        if cascade == 'both' or (rerun and coupled):
+            return self.create_matches(match_criteria, top_k=top_k, cascade=cascade)
+        incremental = [i for i in range(len(match_criteria)) if i not in rerun]
+        incremental_criteria = [match_criteria[i] for i in incremental]
+
+        # Earlier matches involving a changed or deleted record are discarded.
+        left_stale = (old_left < 0) | np.isin(old_left, left_changed)
+        stale = left_stale | (old_right < 0) | np.isin(old_right, right_changed)
+
+        # Records in left_data which have changed are matched against every unchanged record in right_data.
+        left_positions = [np.array([], dtype=np.int64) for _ in match_criteria]
+        right_positions = [np.array([], dtype=np.int64) for _ in match_criteria]
+        stats = [[] for _ in match_criteria]
+        if len(left_changed):
+            swapped_positions, swapped_stats = self._swapped_matcher(left_changed)._match_positions(
+                incremental_criteria
+            )
+            for i, (swapped_right, swapped_left), swapped_stat in zip(incremental, swapped_positions, swapped_stats):
+                unchanged = ~np.isin(swapped_right, right_changed)
+                left_positions[i] = left_changed[swapped_left[unchanged]]
+                right_positions[i] = swapped_right[unchanged]
+                stats[i].append(swapped_stat)
+
+        recompute = right_changed
+        if coupled:
+            # The best matches for a right record, or the match type which first matches it when cascading, may
+            # change whenever any of its candidates change. Such records are matched afresh against the whole of
+            # left_data.
+            affected = [old_right[left_stale & (old_right >= 0)]] + right_positions
+            recompute = np.unique(np.concatenate([right_changed] + affected))
+            stale |= np.isin(old_right, recompute)
+            left_positions = [np.array([], dtype=np.int64) for _ in match_criteria]
+            right_positions = [np.array([], dtype=np.int64) for _ in match_criteria]
+
+        # Records in right_data which have changed are matched against the whole of left_data.
+        if len(recompute):
+            subset = self._right_subset(recompute)
+            subset_positions, subset_stats = subset._match_positions(
+                incremental_criteria, top_k=top_k, cascade=cascade
+            )
+            for i, (subset_left, subset_right), subset_stat in zip(incremental, subset_positions, subset_stats):
+                left_positions[i] = np.concatenate([left_positions[i], subset_left])
+                right_positions[i] = np.concatenate([right_positions[i], recompute[subset_right]])
+                stats[i].append(subset_stat)
+
+        # Match types which cannot be updated incrementally are performed afresh, replacing every earlier match.
+        if rerun:
+            rerun_positions, rerun_stats = self._match_positions([match_criteria[i] for i in rerun])
+            for i, (rerun_left, rerun_right), rerun_stat in zip(rerun, rerun_positions, rerun_stats):
+                left_positions[i] = rerun_left
+                right_positions[i] = rerun_right
+                stats[i].append(rerun_stat)
+
+        results = []
+        match_types = pairs['match_type'].to_numpy()
+        for i, match_type in enumerate(match_criteria):
+            if i in rerun:
+                kept = np.zeros(len(pairs), dtype=bool)
+            elif type_ids[i] is not None:
+                kept = ~stale & (match_types == type_ids[i])
+            else:
+                kept = ~stale & pd.isna(match_types)
+            match_type_left = np.concatenate([old_left[kept], left_positions[i]])
+            match_type_right = np.concatenate([old_right[kept], right_positions[i]])
+            order = np.lexsort((match_type_right, match_type_left))
+            results.append(pd.DataFrame({
+                'left_position': match_type_left[order],
+                'right_position': match_type_right[order],
+                'match_type': type_ids[i]
+            }))
+            if not stats[i]:
+                stats[i].append(dict(
+                    type_id=type_ids[i], method=match_type['method'], wall_seconds=0.0, candidate_pairs=0,
+                    length_pruned=0, pairs_kept=0, peak_memory_delta_mb=0.0
+                ))
+        return MatchResult(
+            pd.concat(results, ignore_index=True),
+            self.left_data,
+            self.left_id_field,
+            self.right_data,
+            self.right_id_field,
+            pd.DataFrame([_combine_stats(match_type_stats) for match_type_stats in stats], columns=STATS_COLUMNS),
+            self.interned,
+            self.left_source,
+            self.right_source
+        )
+
+    def _swapped_matcher(self, left_positions):
+        """
+        Returns a Matcher with the roles of the datasets reversed, matching the given records of left_data against
+        right_data. Matching methods other than ngram_cosine are symmetric, so the same pairs are found either way
+        round; ngram_cosine weighs n-grams by their frequency within left_data, and keeps the top_n matches of each
+        right record, so must not be performed reversed. The indexes built on right_data are kept, so that later
+        calls need not rebuild them.
+        """
+        if self._right_index is None:
+            self._right_index = LeftIndex(self.right_data)
+        return Matcher(
+            None,
+            self.right_id_field,
+            self.left_data.iloc[left_positions],
+            self.left_id_field,
+            self.suffixes[::-1],
+            self._right_index
+        )
+
+    def register_hook(self, event, callback):
+        """
+        Registers a callback to be notified of progress while matching, eg to forward timings to a metrics system.
+
+        Parameters
+        ----------
+        event : string
+            One of:
+            'on_criterion_start' - called as callback(match_type) before each match type is performed
+            'on_criterion_end' - called as callback(match_type, stats) after each match type is performed, where
+                stats is a dictionary as described by MatchResult.stats
+            'on_chunk' - called as callback(chunk_number, stats) after each chunk passed to iter_matches (or each
+                shard of right_data when using n_jobs) is matched, where stats is a DataFrame as MatchResult.stats
+            When using n_jobs, on_criterion_start and on_criterion_end are only called once all shards are matched,
+            with stats combined across shards.
+        callback : function, lambda, or other callable
+        """
+        if event not in HOOK_EVENTS:
+            raise ValueError("Event {} is not one of {}.".format(event, ', '.join(HOOK_EVENTS)))
+        self.hooks.setdefault(event, []).append(callback)
+
+    def _call_hooks(self, event, *args):
+        for callback in self.hooks.get(event, ()):
+            callback(*args)
+
+    def _match_positions(self, match_criteria, top_k=None, max_pairs=None, cascade=None):
+        """
+        Returns, for each match type, the positions of the matched records within left_data and right_data, along
+        with statistics describing how each match type was performed.
+        Matches are ordered by left position, then by right position.
+        """
+        positions = []
+        stats = []
+        # Distances and similarities between values are shared by every match type within the run.
+        distance_cache = {}
+        kept = np.zeros(len(self.right_data), dtype=np.int64)
+        kept_pairs = np.array([], dtype=np.int64)
+        right_matched = np.zeros(len(self.right_data), dtype=bool)
+        left_matched = np.zeros(len(self.left_data), dtype=bool)
+        for match_type in match_criteria:
+            self._call_hooks('on_criterion_start', match_type)
+            started = time.perf_counter()
+            peak_memory = peak_memory_mb()
+            match_type_stats = {'type_id': match_type.get('type_id'), 'method': match_type['method']}
+
+            # Only right records with room for more matches, and those not yet matched when cascading, take part.
+            right_active = ~right_matched
+            if top_k is not None:
+                right_active &= kept < top_k
+            left_positions, right_positions, scores = self._residual_pairs(
+                match_type, match_type_stats, distance_cache, max_pairs, right_active, ~left_matched
+            )
+            if top_k is not None:
+                left_positions, right_positions = _select_top_k(
+                    left_positions, right_positions, scores, kept, kept_pairs, top_k
+                )
+                kept += np.bincount(right_positions, minlength=len(self.right_data))
+                kept_pairs = np.concatenate([kept_pairs, left_positions * len(self.right_data) + right_positions])
+                order = np.lexsort((right_positions, left_positions))
+                left_positions, right_positions = left_positions[order], right_positions[order]
+            if cascade is not None:
+                right_matched[right_positions] = True
+            if cascade == 'both':
+                left_matched[left_positions] = True
+
+            match_type_stats['pairs_kept'] = len(left_positions)
+            match_type_stats['wall_seconds'] = time.perf_counter() - started
+            match_type_stats['peak_memory_delta_mb'] = peak_memory_mb() - peak_memory
+            positions.append((left_positions, right_positions))
+            stats.append(match_type_stats)
+            self._call_hooks('on_criterion_end', match_type, match_type_stats)
+        return positions, stats
+
+    def _residual_pairs(self, match_type, stats, distance_cache, max_pairs, right_active, left_active):
+        """
+        Performs _match_type_pairs for only the active records of right_data and left_data (given as boolean
+        masks), returning positions within the whole of each dataset.
+        """
+        if right_active.all() and left_active.all():
+            return self._match_type_pairs(match_type, stats, distance_cache, max_pairs)
+        if not right_active.any() or not left_active.any():
+            # Every record of one dataset has already been matched when cascading.
+            stats.update(candidate_pairs=0, length_pruned=0)
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty
+        matcher = self
+        left_subset = None
+        if not left_active.all():
+            left_subset = np.flatnonzero(left_active)
+            matcher = self._for_left(left_subset)
+            # Cached distances refer to the distinct values of the whole of left_data, so are not shared.
+            distance_cache = {}
+        right_subset = np.flatnonzero(right_active)
+        subset = matcher._right_subset(right_subset)
+        left_positions, right_positions, scores = subset._match_type_pairs(
+            match_type, stats, distance_cache, max_pairs
+        )
+        if left_subset is not None:
+            left_positions = left_subset[left_positions]
+        return left_positions, right_subset[right_positions], scores
+
+    def _match_type_pairs(self, match_type, stats, distance_cache=None, max_pairs=None):
+        """
+        Returns the positions of the records matched by a single match type, along with a score for each match.
+        Lower scores indicate closer matches: total Levenshtein distance, or the total by which similarities fall
+        short of 1. Counts of the pairs considered are recorded in stats. distance_cache and max_pairs are passed to
+        _similar_pairs (and max_pairs to _ngram_pairs).
+        """
+        if match_type['method'] == 'exact_match':
+            left_positions, right_positions = self._field_pairs(match_type['fields'])
+            scores = np.zeros(len(left_positions), dtype=np.int64)
+            stats.update(candidate_pairs=len(left_positions), length_pruned=0)
+        elif match_type['method'] == 'function':
+            left_positions, right_positions = self._field_pairs([function_key(match_type)])
+            scores = np.zeros(len(left_positions), dtype=np.int64)
+            stats.update(candidate_pairs=len(left_positions), length_pruned=0)
+        elif match_type['method'] == 'phonetic':
+            left_positions, right_positions = self._field_pairs(phonetic_keys(match_type))
+            scores = np.zeros(len(left_positions), dtype=np.int64)
+            stats.update(candidate_pairs=len(left_positions), length_pruned=0)
+        elif match_type['method'] == 'levenshtein':
+            left_positions, right_positions, distances = self._similar_pairs(
+                match_type['fields'],
+                match_type.get('blocking'),
+                stats,
+                match_type.get('engine', 'brute'),
+                distance_cache,
+                max_pairs
+            )
+            scores = sum(distances.values(), np.zeros(len(left_positions), dtype=np.int64))
+        elif match_type['method'] == 'jaro_winkler':
+            left_positions, right_positions, similarities = self._similar_pairs(
+                match_type['fields'],
+                match_type.get('blocking'),
+                stats,
+                distance_cache=distance_cache,
+                max_pairs=max_pairs,
+                measure='jaro_winkler'
+            )
+            scores = sum(
+                (1 - similarity for similarity in similarities.values()), np.zeros(len(left_positions))
+            )
+        elif match_type['method'] == 'ngram_cosine':
+            left_positions, right_positions, similarities = self._ngram_pairs(
+                match_type['fields'],
+                match_type['threshold'],
+                match_type.get('blocking'),
+                stats,
+                match_type.get('top_n'),
+                match_type.get('ngram_size', 3),
+                max_pairs
+            )
+            scores = 1 - similarities
+        return left_positions, right_positions, scores
 
-        return MatchResult(match_results, self.left_id_field, self.right_id_field)
+    def _match_positions_parallel(self, match_criteria, n_jobs, options):
+        """
+        Performs _match_positions across shards of right_data in a pool of worker processes. The Matcher is handed to
+        each worker once, when the worker starts, so that only shard boundaries are sent along with each task.
+        """
+        if n_jobs < 0:
+            n_jobs = multiprocessing.cpu_count()
+        n_shards = max(1, min(len(self.right_data), n_jobs * 4))
+        bounds = np.linspace(0, len(self.right_data), n_shards + 1).astype(int)
+        # Indexes are built before workers start, so that each worker inherits them rather than building its own.
+        self.left_index.prepare(match_criteria)
+        # Hooks are called here, rather than within each worker.
+        worker_matcher = Matcher(
+            None, self.left_id_field, self.right_data, self.right_id_field, self.suffixes, self.left_index
+        )
+        worker_matcher._self_positions = self._self_positions
+        # Forked workers inherit the Matcher (and any lambdas within match criteria) without pickling.
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        initargs = (worker_matcher, match_criteria, options)
+        shards = []
+        with context.Pool(n_jobs, initializer=_initialize_worker, initargs=initargs) as pool:
+            for shard_number, shard in enumerate(pool.imap(_match_shard, zip(bounds[:-1], bounds[1:]))):
+                self._call_hooks('on_chunk', shard_number, pd.DataFrame(shard[1], columns=STATS_COLUMNS))
+                shards.append(shard)
+
+        # Reassemble results for each match type in order, as they would have been produced serially.
+        positions = []
+        stats = []
+        for i, match_type in enumerate(match_criteria):
+            self._call_hooks('on_criterion_start', match_type)
+            left_positions = np.concatenate([shard_positions[i][0] for shard_positions, _ in shards])
+            right_positions = np.concatenate([shard_positions[i][1] for shard_positions, _ in shards])
+            order = np.lexsort((right_positions, left_positions))
+            positions.append((left_positions[order], right_positions[order]))
+            match_type_stats = _combine_stats([shard_stats[i] for _, shard_stats in shards])
+            stats.append(match_type_stats)
+            self._call_hooks('on_criterion_end', match_type, match_type_stats)
+        return positions, stats
+
+    def _for_right(self, right_data):
+        """
+        Returns a Matcher sharing left_data (and its indexes) with this one, for matching against a different set of
+        right records.
+        """
+        matcher = Matcher(
+            None, self.left_id_field, right_data, self.right_id_field, self.suffixes, self.left_index, self.interned
+        )
+        matcher.hooks = self.hooks
+        matcher.left_source = self.left_source
+        return matcher
+
+    def _right_subset(self, right_positions):
+        """
+        Returns a Matcher sharing left_data (and its indexes) with this one, for matching against only the given
+        records of right_data. Keys already computed for the whole of right_data are shared rather than computed
+        again.
+        """
+        matcher = self._for_right(self.right_data.iloc[right_positions])
+        matcher.right_keys = {key: values.iloc[right_positions] for key, values in self.right_keys.items()}
+        if self._self_positions is not None:
+            matcher._self_positions = self._self_positions[right_positions]
+        return matcher
+
+    def _for_self(self):
+        """
+        Returns a Matcher sharing left_data (and its indexes) with this one, for matching left_data against itself.
+        The id field of the copy of left_data matched against is suffixed as given by suffixes, so that the ids of
+        both records of each pair can be told apart.
+        """
+        right_data = self.left_data.copy(deep=False)
+        right_data.columns = [
+            column + self.suffixes[1] if column == self.left_id_field else column for column in right_data.columns
+        ]
+        matcher = Matcher(
+            None,
+            self.left_id_field,
+            right_data,
+            self.left_id_field + self.suffixes[1],
+            self.suffixes,
+            self.left_index,
+            self.interned
+        )
+        matcher.hooks = self.hooks
+        matcher.left_source = self.left_source
+        # The id field of the file is read under its suffixed name, as held in right_data.
+        matcher.right_source = self.left_source and self.left_source.rename(
+            {self.left_id_field: self.left_id_field + self.suffixes[1]}
+        )
+        matcher._self_positions = np.arange(len(self.left_data))
+        return matcher
+
+    def _upper_pairs(self, left_positions, right_positions):
+        """
+        When deduplicating, returns only those pairs of records where the left record comes before the right record
+        within left_data, so that each pair is compared once and no record is compared with itself. Otherwise,
+        returns the pairs unchanged.
+        """
+        if self._self_positions is None:
+            return left_positions, right_positions
+        keep = left_positions < self._self_positions[right_positions]
+        return left_positions[keep], right_positions[keep]
+
+    def _for_left(self, left_positions):
+        """
+        Returns a Matcher for matching right_data against only the given records of left_data. Indexes are built
+        afresh on those records, rather than shared with this Matcher.
+        """
+        matcher = Matcher(
+            self.left_data.iloc[left_positions],
+            self.left_id_field,
+            self.right_data,
+            self.right_id_field,
+            self.suffixes,
+            intern=self.interned
+        )
+        matcher.hooks = self.hooks
+        matcher.right_source = self.right_source
+        return matcher
+
+    def _field_pairs(self, keys):
+        """
+        Returns the positions of every pair of records with equal values for each of the provided keys.
+        """
+        key_index = self.left_index.key_index(keys)
+        if self._self_positions is not None and len(self.right_data) == len(self.left_data):
+            # Matching the whole of left_data against itself, each pair is generated only once.
+            return key_index.self_pairs()
+        return self._upper_pairs(*key_index.pairs([self._right_key_values(key) for key in keys]))
+
+    def _right_key_values(self, key):
+        """
+        Returns the values of a matching key for every record in right_data. Keys computed by a function are
+        cached, so that each function is applied to right_data only once.
+        """
+        if not hasattr(key, '__call__'):
+            return self.right_data[key]
+        values = self.right_keys.get(key)
+        if values is None:
+            values = key_values(self.right_data, key)
+            # The cache is replaced rather than changed, so that threads reading it never see it change.
+            self.right_keys = {**self.right_keys, key: values}
+        return values
 
     def match_on_field(self, field_list, type_id=None):
         """
@@ -147,20 +1223,22 @@ class Matcher(object):
         ----------
         field_list : list of one or more strings
             Records with matching values in each field across the two datasets are considered to be matches.
+            Missing values never match.
         type_id : int or string (optional), default None
             Used to uniquely identify an individual match type
         Returns
         -------
         DataFrame
         """
-        merged_df = pd.merge(self.left_data, self.right_data, on=field_list, suffixes=self.suffixes)
+        merged_df = self._join_rows(*self._field_pairs(field_list), on=field_list)
         merged_df['matched_to'] = merged_df[self.left_id_field]
         merged_df['match_type'] = type_id
         return merged_df
 
-    def match_on_function(self, func, type_id=None):
+    def match_on_function(self, func, type_id=None, vectorized=False):
         """
-        Returns data which matches after the provided callable is applied.
+        Returns data which matches after the provided callable is applied. Neither left_data nor right_data is
+        modified; the values returned by the callable are kept for as long as the Matcher, and reused by later calls.
 
         Parameters
         ----------
@@ -168,28 +1246,37 @@ class Matcher(object):
             Will be applied to left_data and right_data
         type_id : int or string (optional), default None
             Used to uniquely identify an individual match type
+        vectorized : bool, default False
+            If True, func is called once with each whole DataFrame rather than once per row; see VectorizedFunction.
         Returns
         -------
         DataFrame
         """
-        if hasattr(func, '__name__'):
-            match_column = func.__name__
-        else:
-            match_column = 'MatchColumn'
-        self.left_data[match_column] = self.left_data.apply(func, axis=1)
-        self.right_data[match_column] = self.right_data.apply(func, axis=1)
-        result = self.match_on_field([match_column], type_id)
-        self.left_data.drop(match_column, axis=1, inplace=True)
-        self.right_data.drop(match_column, axis=1, inplace=True)
-        result.drop(match_column, axis=1, inplace=True)
+        if vectorized:
+            func = VectorizedFunction(func)
+        result = self._join_rows(*self._field_pairs([func]))
+        result['matched_to'] = result[self.left_id_field]
+        result['match_type'] = type_id
         return result
 
-    def levenshtein(self, fields, type_id=None):
+    def levenshtein(self, fields, type_id=None, blocking=None, engine='brute', max_pairs=None):
         """
         Returns data matched using the Levenshtein Distance algorithm (difference between two strings as
-        measured by the number of edits necessary to make them equal). A cross-join is performed between the two
-        provided datasets, and the Levenshtein Distance is calculated for each applicable field. Results are filtered
-        to the specified level of precision.
+        measured by the number of edits necessary to make them equal). Records in the two provided datasets are
+        compared pairwise, skipping pairs whose lengths differ by more than the precision allows, and the Levenshtein
+        Distance is calculated for each applicable field. Fields are compared from the most precise to the least, each
+        only for the pairs within precision on every field before it, and each distance only until it is found to
+        exceed the precision. Results are filtered to the specified level of precision.
+
+        When blocking keys are provided, only records sharing every blocking key are compared, rather than the full
+        cross-join. This greatly reduces the number of candidate pairs for large datasets, at the cost of never
+        matching records which fall into different blocks. Records missing a blocking key are not compared at all,
+        nor are records missing the value of any field compared.
+
+        Rather than comparing records by length, candidates may instead be found by searching an index of the
+        distinct values of the most precise field, for those within its precision of each distinct right value.
+        Matches are identical whichever engine is used; searching is fastest when precision is small relative to
+        the length of the strings compared.
 
         Parameters
         ----------
@@ -198,43 +1285,417 @@ class Matcher(object):
             Precision is an integer indicating the maximum allowed Levenshtein distance for a record to be matched.
         type_id : int or string (optional), default None
             Used to uniquely identify an individual match type
+        blocking : string, callable, or list of strings and/or callables (optional), default None
+            Blocking keys used to generate candidate pairs; see blockjoin_dataframes.
+        engine : string, default 'brute'
+            How candidate pairs are found: 'brute' compares every pair of records whose lengths are close enough
+            (or which share a block), 'bktree' searches a BK-tree, and 'symspell' searches an index of the variants
+            of each value with up to precision characters deleted. Searching engines are combined with blocking by
+            keeping only those candidates which also share a block.
+        max_pairs : int (optional), default None
+            If provided, candidate pairs are generated and filtered in blocks of consecutive right records, each
+            with at most max_pairs candidates (or a single right record, should it alone have more), so that memory
+            use is bounded by the size of a block rather than the total number of candidates. Applies only to the
+            'brute' engine, whose candidates can be counted before they are generated.
         Returns
         -------
         DataFrame : Contains columns from left_data and right_data where a match is made using provided criteria
         """
+        left_positions, right_positions, distances = self._similar_pairs(
+            fields, blocking, engine=engine, max_pairs=max_pairs
+        )
+        matched = self._join_rows(left_positions, right_positions)
+        for field in fields:
+            matched[field['field_name'] + '_levenshtein_distance'] = distances[field['field_name']]
+        matched['match_type'] = type_id
+        matched['matched_to'] = matched[self.left_id_field]
+        return matched
+
+    def jaro_winkler(self, fields, type_id=None, blocking=None, max_pairs=None):
+        """
+        Returns data matched using Jaro-Winkler similarity (between 0 and 1, measuring how many characters two
+        strings share in a similar order, with a bonus for a shared prefix), which suits short strings such as
+        names. Records are compared pairwise as for levenshtein, skipping pairs whose lengths are too different for
+        their similarity to reach the threshold, and each distinct pair of values is compared only once.
+
+        Parameters
+        ----------
+        fields : list of dictionaries
+            including field names and minimum similarity eg {'field_name': 'first_name', 'threshold': 0.9}
+        type_id : int or string (optional), default None
+            Used to uniquely identify an individual match type
+        blocking : string, callable, or list of strings and/or callables (optional), default None
+            Blocking keys used to generate candidate pairs; see blockjoin_dataframes.
+        max_pairs : int (optional), default None
+            If provided, candidate pairs are generated and filtered in blocks of at most max_pairs pairs; see
+            levenshtein.
+        Returns
+        -------
+        DataFrame : Contains columns from left_data and right_data where a match is made using provided criteria
+        """
+        left_positions, right_positions, similarities = self._similar_pairs(
+            fields, blocking, max_pairs=max_pairs, measure='jaro_winkler'
+        )
+        matched = self._join_rows(left_positions, right_positions)
+        for field in fields:
+            matched[field['field_name'] + '_jaro_winkler_similarity'] = similarities[field['field_name']]
+        matched['match_type'] = type_id
+        matched['matched_to'] = matched[self.left_id_field]
+        return matched
+
+    def _similar_pairs(self, fields, blocking=None, stats=None, engine='brute', distance_cache=None, max_pairs=None,
+                       measure='levenshtein'):
+        """
+        Returns the positions of every pair of records within the limit of each field - at most its precision in
+        Levenshtein distance, or at least its threshold in Jaro-Winkler similarity, as given by measure - along with
+        a dictionary of the distances (or similarities) for each field. Counts of the pairs considered are recorded
+        in stats, if provided. distance_cache is passed to _field_distances. When max_pairs is provided, candidates
+        are generated and filtered in blocks of at most max_pairs pairs; see levenshtein.
+        """
         for field in fields:
             assert field['field_name'] in self.left_data.columns
             assert field['field_name'] in self.right_data.columns
+        if blocking is not None:
+            for block in as_list(blocking):
+                if not hasattr(block, '__call__'):
+                    assert block in self.left_data.columns
+                    assert block in self.right_data.columns
 
-        for field in fields:
-            field['left'] = field['field_name'] + self.suffixes[0]
-            field['right'] = field['field_name'] + self.suffixes[1]
-            field['levenshtein'] = field['field_name'] + '_levenshtein_distance'
+        if max_pairs is not None and engine == 'brute':
+            counts = self._candidate_counts(fields, blocking, measure)
+            if counts.sum() > max_pairs:
+                return self._similar_pairs_in_blocks(
+                    fields, blocking, stats, distance_cache, counts, max_pairs, measure
+                )
 
-        crossed = crossjoin_dataframes(self.left_data, self.right_data, suffixes=self.suffixes)
-        crossed['match_type'] = type_id
+        if engine == 'brute':
+            left_positions, right_positions = self._candidate_pairs(fields, blocking, measure)
+        else:
+            left_positions, right_positions = self._searched_pairs(fields, blocking, engine)
+        left_positions, right_positions = self._upper_pairs(left_positions, right_positions)
+        candidate_pairs = len(left_positions)
 
-        # Minimum Levenshtein distance between two strings is the difference in their length.
-        # Because calculating Levenshtein across the entire cross-joined data may be expensive,
-        # we eliminate candidates where the difference in length makes a successful match impossible.
+        # Lengths bound both measures: Levenshtein distance is at least the difference in length of two strings,
+        # and Jaro-Winkler similarity falls as their lengths diverge. Because comparing every candidate pair may be
+        # expensive, we eliminate candidates where the difference in length makes a successful match impossible.
+        # Lengths are computed once per record on each side, then compared across all candidates at once.
         for field in fields:
-            crossed['length_diff'] = crossed.apply(
-                lambda row: abs(len(row[field['left']]) - len(row[field['right']])),
-                axis=1
+            _, left_lengths = self.left_index.string_values(field['field_name'])
+            shortest, longest = _length_bounds(field, measure, self._right_lengths(field['field_name']))
+            lengths = left_lengths[left_positions]
+            keep = (lengths >= shortest[right_positions]) & (lengths <= longest[right_positions])
+            left_positions = left_positions[keep]
+            right_positions = right_positions[keep]
+        if stats is not None:
+            stats.update(candidate_pairs=candidate_pairs, length_pruned=candidate_pairs - len(left_positions))
+
+        # Fields are compared from the most to the least selective, and each discards the pairs outside its limit
+        # before the next is compared, so that later fields are only compared for the pairs still in contention.
+        # Each comparison stops as soon as a pair is found to be outside the limit of the field.
+        distances = {}
+        for field in _by_selectivity(fields, measure):
+            field_distances = self._field_distances(
+                field['field_name'], left_positions, right_positions, distance_cache, measure, _limit(field, measure)
             )
-            crossed = crossed[crossed['length_diff'] <= field['precision']]
+            keep = _within_limit(field, measure, field_distances)
+            left_positions = left_positions[keep]
+            right_positions = right_positions[keep]
+            distances = {field_name: distance[keep] for field_name, distance in distances.items()}
+            distances[field['field_name']] = field_distances[keep]
+        # Only results inside the specified limits are returned.
+        return left_positions, right_positions, distances
 
-        for field in fields:
-            crossed[field['levenshtein']] = crossed.apply(
-                lambda row: Levenshtein.distance(row[field['left']], row[field['right']]),
-                axis=1
+    def _right_lengths(self, field_name):
+        return string_lengths(self.right_data[field_name].to_numpy(dtype=object))
+
+    def _field_distances(self, field_name, left_positions, right_positions, cache=None, measure='levenshtein',
+                         limit=None):
+        """
+        Returns the Levenshtein distance (or Jaro-Winkler similarity, as given by measure) between the values of a
+        field held by each pair of records. Values repeat heavily (many records share a surname), so each distinct
+        pair of values is compared only once, and its result then mapped back to every pair of records holding it.
+
+        If provided, limit is the precision of the field: pairs outside it are not compared in full, and are given
+        a distance which is merely greater than it (see _compare_values).
+
+        If provided, cache is a dictionary holding the results already computed for each measure and field, keyed
+        by (measure, field_name); pairs of values found there are not compared again (unless they were compared
+        subject to a tighter limit), and new results are added.
+        """
+        if measure not in BOUNDED_MEASURES:
+            limit = None
+        key_index = self.left_index.key_index([field_name])
+        left_uniques = key_index.uniques[0].to_numpy(dtype=object)
+        if cache is None:
+            cache = {}
+        dtype = MEASURES[measure][1]
+        right_uniques, known_pairs, known_distances, known_limits = cache.get(
+            (measure, field_name),
+            (pd.Index([], dtype=object), pd.Index([], dtype=np.int64), np.array([], dtype=dtype), np.array([]))
+        )
+        # Right values are encoded against those already seen, so that codes remain valid for every right dataset.
+        right_values = self.right_data[field_name]
+        right_codes = index_codes(right_uniques, right_values)
+        unseen = right_codes < 0
+        unseen_codes, unseen_values = pd.factorize(right_values[unseen])
+        right_codes[unseen] = unseen_codes + len(right_uniques)
+        right_uniques = right_uniques.append(pd.Index(np.asarray(unseen_values, dtype=object), dtype=object))
+
+        pair_codes = right_codes[right_positions] * len(left_uniques) + key_index.codes[left_positions]
+        pair_codes, distinct_pairs = pd.factorize(pair_codes)
+        found = known_pairs.get_indexer(distinct_pairs)
+        reusable = found >= 0
+        reusable[reusable] = _covers(
+            measure, known_distances[found[reusable]], known_limits[found[reusable]], limit
+        )
+        distinct_distances = np.empty(len(distinct_pairs), dtype=dtype)
+        distinct_distances[reusable] = known_distances[found[reusable]]
+        compared = distinct_pairs[~reusable]
+        distinct_distances[~reusable] = _compare_values(
+            measure,
+            left_uniques[compared % len(left_uniques)],
+            right_uniques.to_numpy()[compared // len(left_uniques)],
+            limit
+        )
+
+        # Pairs compared again subject to a looser limit replace their earlier results.
+        if limit is None:
+            limit = np.inf if measure == 'levenshtein' else -np.inf
+        stale = ~reusable & (found >= 0)
+        if stale.any():
+            known_distances = known_distances.copy()
+            known_limits = known_limits.copy()
+            known_distances[found[stale]] = distinct_distances[stale]
+            known_limits[found[stale]] = limit
+        new = found < 0
+        cache[measure, field_name] = (
+            right_uniques,
+            known_pairs.append(pd.Index(distinct_pairs[new])),
+            np.concatenate([known_distances, distinct_distances[new]]),
+            np.concatenate([known_limits, np.full(new.sum(), limit, dtype=np.float64)])
+        )
+        return distinct_distances[pair_codes]
+
+    def _candidate_pairs(self, fields, blocking=None, measure='levenshtein'):
+        """
+        Returns row positions of every pair of records to be compared: those sharing all blocking keys, or
+        otherwise those whose lengths are close enough to match on the most selective field.
+        Pairs are ordered by left position, then by right position.
+        """
+        if blocking is not None:
+            return self._field_pairs(as_list(blocking))
+        field = _most_selective(fields, measure)
+        shortest, longest = _length_bounds(field, measure, self._right_lengths(field['field_name']))
+        return self.left_index.length_index(field['field_name']).pairs_within(shortest, longest)
+
+    def _similar_pairs_in_blocks(self, fields, blocking, stats, distance_cache, counts, max_pairs, measure):
+        """
+        Performs _similar_pairs over consecutive blocks of right records, given the number of candidates for each,
+        so that at most max_pairs candidates are held at once. Only the pairs kept from each block accumulate.
+        """
+        if distance_cache is None:
+            distance_cache = {}
+        cumulative = np.concatenate([[0], np.cumsum(counts)])
+        blocks = []
+        start = 0
+        while start < len(counts):
+            stop = max(start + 1, np.searchsorted(cumulative, cumulative[start] + max_pairs, side='right') - 1)
+            block = self._right_subset(np.arange(start, stop))
+            block_stats = {}
+            left_positions, right_positions, distances = block._similar_pairs(
+                fields, blocking, block_stats, distance_cache=distance_cache, measure=measure
+            )
+            blocks.append((left_positions, right_positions + start, distances, block_stats))
+            start = stop
+
+        left_positions = np.concatenate([block[0] for block in blocks])
+        right_positions = np.concatenate([block[1] for block in blocks])
+        order = np.lexsort((right_positions, left_positions))
+        distances = {
+            field['field_name']: np.concatenate([block[2][field['field_name']] for block in blocks])[order]
+            for field in fields
+        }
+        if stats is not None:
+            stats.update(
+                candidate_pairs=sum(block[3]['candidate_pairs'] for block in blocks),
+                length_pruned=sum(block[3]['length_pruned'] for block in blocks)
             )
-        filters = (crossed[field['levenshtein']].le(field['precision']) for field in fields)
-        chained_filters = reduce(and_, filters)
-        # Only return results inside the specified distance.
-        crossed['matched_to'] = crossed[self.left_id_field]
-        crossed = crossed[chained_filters]
-        return crossed
+        return left_positions[order], right_positions[order], distances
+
+    def _candidate_counts(self, fields, blocking=None, measure='levenshtein'):
+        """
+        Returns the number of pairs _candidate_pairs would produce for each right record, without producing them.
+        """
+        if blocking is not None:
+            keys = as_list(blocking)
+            return self.left_index.key_index(keys).counts([self._right_key_values(key) for key in keys])
+        field = _most_selective(fields, measure)
+        shortest, longest = _length_bounds(field, measure, self._right_lengths(field['field_name']))
+        return self.left_index.length_index(field['field_name']).counts_within(shortest, longest)
+
+    def _searched_pairs(self, fields, blocking, engine):
+        """
+        Returns row positions of every pair of records within precision of one another on the most precise field,
+        found by searching an index of its distinct left values. When blocking keys are provided, only those pairs
+        also sharing all blocking keys are kept. Pairs are ordered by left position, then by right position.
+        """
+        field = min(fields, key=lambda field: field['precision'])
+        search_index = self.left_index.search_index(field['field_name'], engine, field['precision'])
+        # Each distinct right value is searched for once, and each pair of distinct values found is then expanded to
+        # every right record holding the right value, and every left record holding the left value.
+        right_index = KeyIndex([self.right_data[field['field_name']]])
+        found = [search_index.search(value, field['precision']) for value in right_index.uniques[0]]
+        counts = np.fromiter(map(len, found), dtype=np.int64, count=len(found))
+        left_codes = np.fromiter((code for codes in found for code in codes), dtype=np.int64, count=counts.sum())
+        right_positions, left_codes = right_index.expand(np.repeat(np.arange(len(found)), counts), left_codes)
+        left_positions, right_positions = self.left_index.key_index([field['field_name']]).expand(
+            left_codes, right_positions
+        )
+        if blocking is not None:
+            keep = self._share_blocks(left_positions, right_positions, blocking)
+            left_positions = left_positions[keep]
+            right_positions = right_positions[keep]
+        return left_positions, right_positions
+
+    def _share_blocks(self, left_positions, right_positions, blocking):
+        """
+        Returns whether each pair of records shares all blocking keys.
+        """
+        keys = as_list(blocking)
+        block_index = self.left_index.key_index(keys)
+        right_blocks = block_index.lookup([self._right_key_values(key) for key in keys])
+        left_blocks = block_index.codes[left_positions]
+        return (left_blocks >= 0) & (left_blocks == right_blocks[right_positions])
+
+    def ngram_cosine(self, fields, threshold, type_id=None, blocking=None, top_n=None, ngram_size=3, max_pairs=None):
+        """
+        Returns data matched using the cosine similarity of the character n-grams of their text, each weighted by
+        TF-IDF so that rare n-grams count for more than common ones. Unlike edit distances, this tolerates words
+        which are reordered, added or missing, eg matching "Smith John" to "John A Smith".
+
+        Rather than comparing every pair of records, each distinct right text is scored only against the distinct
+        left texts sharing at least one of its n-grams, found through an inverted index (a sparse matrix of n-gram
+        weights) built on left_data.
+
+        Parameters
+        ----------
+        fields : list of strings
+            Fields whose values are joined by spaces to form the text of each record, eg ['first_name', 'last_name']
+        threshold : float
+            Minimum cosine similarity for a record to be matched, greater than 0 and at most 1.
+        type_id : int or string (optional), default None
+            Used to uniquely identify an individual match type
+        blocking : string, callable, or list of strings and/or callables (optional), default None
+            Blocking keys which matched records must share; see blockjoin_dataframes.
+        top_n : int (optional), default None
+            If provided, at most top_n matches are kept for each right record: those with the highest similarity,
+            followed by those earliest in left_data.
+        ngram_size : int, default 3
+            Number of characters in each n-gram. Text is lower-cased and padded with a space at either end.
+        max_pairs : int (optional), default None
+            If provided, right texts are scored in batches multiplying at most max_pairs pairs of n-gram weights, so
+            that memory use is bounded by the size of a batch.
+        Returns
+        -------
+        DataFrame : Contains columns from left_data and right_data where a match is made using provided criteria
+        """
+        left_positions, right_positions, similarities = self._ngram_pairs(
+            fields, threshold, blocking, top_n=top_n, ngram_size=ngram_size, max_pairs=max_pairs
+        )
+        matched = self._join_rows(left_positions, right_positions)
+        matched['cosine_similarity'] = similarities
+        matched['match_type'] = type_id
+        matched['matched_to'] = matched[self.left_id_field]
+        return matched
+
+    def _ngram_pairs(self, fields, threshold, blocking=None, stats=None, top_n=None, ngram_size=3, max_pairs=None):
+        """
+        Returns the positions of every pair of records whose text is at least threshold in n-gram cosine similarity,
+        along with the similarity of each pair. Pairs are ordered by left position, then by right position.
+        """
+        for field in fields:
+            assert field in self.left_data.columns
+            assert field in self.right_data.columns
+        key = text_key(fields)
+        key_index = self.left_index.key_index([key])
+        ngram_index = self.left_index.ngram_index(fields, ngram_size)
+        # Each distinct right text is searched for once, and each pair of distinct texts found is then expanded to
+        # every right record holding the right text, and every left record holding the left text.
+        right_index = KeyIndex([self._right_key_values(key)])
+        right_codes, left_codes, similarities = ngram_index.search(
+            right_index.uniques[0].to_numpy(dtype=object), threshold, max_pairs or 1000000
+        )
+        if top_n is not None and blocking is None and self._self_positions is None:
+            # Every distinct left text is held by at least one record, so the best records for a right record are
+            # held by its best top_n texts (along with any tied with the last of them).
+            best = _best_values(right_codes, similarities, top_n)
+            right_codes, left_codes, similarities = right_codes[best], left_codes[best], similarities[best]
+        right_positions, expanded_codes = right_index.expand(right_codes, left_codes)
+        left_positions, right_positions = self._upper_pairs(*key_index.expand(expanded_codes, right_positions))
+        # Similarities are found for each pair of records from the pair of distinct texts it holds.
+        distinct_pairs = pd.Index(right_codes * len(key_index.uniques[0]) + left_codes)
+        n_left_texts = len(key_index.uniques[0])
+        record_pairs = right_index.codes[right_positions] * n_left_texts + key_index.codes[left_positions]
+        similarities = similarities[distinct_pairs.get_indexer(record_pairs)]
+        if stats is not None:
+            stats.update(candidate_pairs=len(left_positions), length_pruned=0)
+
+        keep = np.arange(len(left_positions))
+        if blocking is not None:
+            keep = np.flatnonzero(self._share_blocks(left_positions, right_positions, blocking))
+        if top_n is not None:
+            room = np.full(len(self.right_data), top_n)
+            # Indexes are sorted again, so that pairs remain ordered by left position, then by right position.
+            keep = keep[np.sort(_keep_best(left_positions[keep], right_positions[keep], 1 - similarities[keep], room))]
+        return left_positions[keep], right_positions[keep], similarities[keep]
+
+    def phonetic(self, fields, algorithm='soundex', type_id=None):
+        """
+        Returns data which matches on the phonetic codes of one or more provided fields, so that values which sound
+        alike, such as Smith and Smyth, are matched. Codes are computed once per distinct value, and then joined on
+        exactly, as for match_on_field.
+
+        Parameters
+        ----------
+        fields : list of one or more strings
+            Records whose values in each field share a phonetic code are considered to be matches. Values without
+            any letters never match.
+        algorithm : string, default 'soundex'
+            Either 'soundex' or 'metaphone'; see matchstick.phonetic.
+        type_id : int or string (optional), default None
+            Used to uniquely identify an individual match type
+        Returns
+        -------
+        DataFrame
+        """
+        result = self._join_rows(*self._field_pairs([PhoneticKey(field, algorithm) for field in fields]))
+        result['matched_to'] = result[self.left_id_field]
+        result['match_type'] = type_id
+        return result
+
+    def _join_rows(self, left_positions, right_positions, on=None):
+        """
+        Builds a DataFrame pairing the given rows of left_data and right_data, laid out as pd.merge would:
+        columns in common (other than those joined on) receive suffixes.
+        """
+        left = decode_columns(
+            fetch_columns(
+                self.left_data, self.left_source, left_positions, all_columns(self.left_data, self.left_source)
+            ),
+            self.interned
+        )
+        right = decode_columns(
+            fetch_columns(
+                self.right_data, self.right_source, right_positions, all_columns(self.right_data, self.right_source)
+            ),
+            self.interned
+        )
+        if on:
+            right = right.drop(on, axis=1)
+        overlap = left.columns.intersection(right.columns)
+        left = left.rename(columns={column: column + self.suffixes[0] for column in overlap})
+        right = right.rename(columns={column: column + self.suffixes[1] for column in overlap})
+        return pd.concat([left, right], axis=1)
 
     @staticmethod
     def validate_match_criteria(match_criteria):
@@ -246,7 +1707,8 @@ class Matcher(object):
         ----------
         match_criteria : list of dictionaries
             Each inner dictionary defines an individual match type, choosing from amongst several available
-            mechanisms - exact match, apply function, or Levenshtein distance.
+            mechanisms - exact match, apply function, phonetic code, Levenshtein distance, Jaro-Winkler similarity,
+            or n-gram cosine similarity.
 
         Example Format
         --------------
@@ -263,27 +1725,85 @@ class Matcher(object):
             },
             {
                 'type_id': 3,
+                'method': 'function',
+                'function': lambda data: data['first_name'].str[:2] + data['last_name'].str[:2],
+                'vectorized': True  # optional
+            },
+            {
+                'type_id': 4,
                 'method': 'levenshtein',
                 'fields': [
                     {'field_name': 'first_name', 'precision': 1},
                     {'field_name': 'last_name', 'precision': 2}
-                ]
+                ],
+                'blocking': [lambda row: row['last_name'][:1]],  # optional
+                'engine': 'symspell'  # optional
+            },
+            {
+                'type_id': 5,
+                'method': 'phonetic',
+                'fields': ['first_name', 'last_name'],
+                'algorithm': 'metaphone'  # optional
+            },
+            {
+                'type_id': 6,
+                'method': 'jaro_winkler',
+                'fields': [
+                    {'field_name': 'first_name', 'threshold': 0.9},
+                    {'field_name': 'last_name', 'threshold': 0.85}
+                ],
+                'blocking': 'zip'  # optional
+            },
+            {
+                'type_id': 7,
+                'method': 'ngram_cosine',
+                'fields': ['first_name', 'last_name'],
+                'threshold': 0.7,
+                'top_n': 3,  # optional
+                'ngram_size': 3,  # optional
+                'blocking': 'zip'  # optional
             },
         """
         for match_type in match_criteria:
             assert 'method' in match_type.keys()
-            assert match_type['method'] in ['exact_match', 'function', 'levenshtein']
+            assert match_type['method'] in [
+                'exact_match', 'function', 'phonetic', 'levenshtein', 'jaro_winkler', 'ngram_cosine'
+            ]
             if match_type['method'] == 'exact_match':
                 assert 'fields' in match_type.keys()
             if match_type['method'] == 'function':
                 assert 'function' in match_type.keys()
                 assert hasattr(match_type['function'], '__call__')
+                assert isinstance(match_type.get('vectorized', False), bool)
             if match_type['method'] == 'levenshtein':
                 assert 'fields' in match_type.keys()
                 for field in match_type['fields']:
                     assert 'field_name' in field.keys()
                     assert 'precision' in field.keys()
                     assert isinstance(field['precision'], int)
+                assert match_type.get('engine', 'brute') in ['brute', 'bktree', 'symspell']
+            if match_type['method'] == 'phonetic':
+                assert 'fields' in match_type.keys()
+                assert match_type.get('algorithm', 'soundex') in ENCODERS
+            if match_type['method'] == 'jaro_winkler':
+                assert 'fields' in match_type.keys()
+                for field in match_type['fields']:
+                    assert 'field_name' in field.keys()
+                    assert 'threshold' in field.keys()
+                    assert isinstance(field['threshold'], (int, float))
+                    assert 0 <= field['threshold'] <= 1
+            if match_type['method'] == 'ngram_cosine':
+                assert 'fields' in match_type.keys()
+                assert len(match_type['fields']) > 0
+                for field in match_type['fields']:
+                    assert isinstance(field, str)
+                assert isinstance(match_type.get('threshold'), (int, float))
+                assert 0 < match_type['threshold'] <= 1
+                assert match_type.get('top_n') is None or match_type['top_n'] >= 1
+                assert isinstance(match_type.get('ngram_size', 3), int) and match_type.get('ngram_size', 3) >= 1
+            if 'blocking' in match_type.keys():
+                for block in as_list(match_type['blocking']):
+                    assert isinstance(block, str) or hasattr(block, '__call__')
 
     def unmatched(self, match_results):
         """
@@ -291,66 +1811,369 @@ class Matcher(object):
 
         Parameters
         ----------
-        match_results : DataFrame
+        match_results : MatchResult or DataFrame
             Contains full set of results made according to provided match criteria
 
         Returns
         -------
         Dataframe : Contains rows and columns from right_data where no match was made to left_data.
         """
-        merged = pd.merge(match_results, self.right_data, on=self.right_id_field, how='right', indicator=True)
-        right_only = merged[merged['_merge'] == 'right_only']
-        return pd.merge(self.right_data, right_only)[self.right_data.columns]
+        if isinstance(match_results, MatchResult):
+            return match_results.unmatched
+        matched = self.right_data[self.right_id_field].isin(match_results[self.right_id_field])
+        unmatched = fetch_columns(
+            self.right_data,
+            self.right_source,
+            np.flatnonzero(~matched.to_numpy()),
+            all_columns(self.right_data, self.right_source)
+        )
+        return decode_columns(unmatched, self.interned)
 
-    def match_to_multiple(self):
+    def match_to_multiple(self, match_results, clusters=False):
         """
         Used to check whether any records in right_data match to more than one record in left_data. Such an occurrence
         would suggest that one of the matches is made in error, or that records within left_data could potentially be
-        combined.
+        combined. See MatchResult.match_to_multiple.
+
+        Parameters
+        ----------
+        match_results : MatchResult or DataFrame
+            Contains full set of results made according to provided match criteria
+        clusters : bool, default False
+            If True, the matched records are also grouped into clusters; see MatchResult.clusters.
+
         Returns
         -------
+        dictionary of DataFrames
         """
-        raise NotImplementedError
+        if not isinstance(match_results, MatchResult):
+            match_results = MatchResult(
+                pd.DataFrame({
+                    'left_position': pd.Index(self.left_data[self.left_id_field]).get_indexer(
+                        match_results[self.left_id_field]
+                    ),
+                    'right_position': pd.Index(self.right_data[self.right_id_field]).get_indexer(
+                        match_results[self.right_id_field]
+                    ),
+                    'match_type': match_results['match_type'].to_numpy()
+                }),
+                self.left_data,
+                self.left_id_field,
+                self.right_data,
+                self.right_id_field,
+                interned=self.interned,
+                left_source=self.left_source,
+                right_source=self.right_source
+            )
+        return match_results.match_to_multiple(clusters)
 
 
 class MatchResult(object):
     """
     MatchResult is a container for data generated by Matcher.create_matches().
 
+    Matches are held compactly, as the positions of the matched records within left_data and right_data along with
+    the match type. Original data columns are only joined onto the matches when requested, whether through
+    matched_data, with_columns or to_frame.
+
     Parameters
     ----------
-    matched_data : DataFrame
-        Contains records which have been matched to each other, including both unique IDs, match type, and original
-        data columns
+    positions : DataFrame
+        One row per match, with columns left_position, right_position and match_type
+    left_data : DataFrame
+        Dataset that was matched against
     left_id_field : string
         Name of the field which uniquely identifies records within left_data
+    right_data : DataFrame
+        Dataset that was matched
     right_id_field : string
-        Name of the field which uniquely identifies records within rogjt_data
+        Name of the field which uniquely identifies records within right_data
+    stats : DataFrame (optional), default None
+        Describes how each match type was performed, with one row per match type and columns:
+        type_id, method - identifying the match type
+        wall_seconds - time taken (summed across shards when using n_jobs)
+        candidate_pairs - pairs of records considered (for Levenshtein matching, after blocking)
+        length_pruned - candidate pairs eliminated by comparing string lengths, before computing any distances
+        pairs_kept - pairs of records matched
+        peak_memory_delta_mb - increase in the peak memory of the process while matching, in megabytes
+    interned : list of strings (optional), default None
+        Fields of left_data and right_data held interned by the Matcher, which are decoded wherever data is returned.
+    left_source, right_source : ColumnarFile (optional), default None
+        Files from which left_data and right_data were read. Columns not held in memory are read from these for
+        matched records only.
+    deduplicated : bool, default False
+        Whether left_data was matched against itself (see Matcher.deduplicate), so that the records of right_data
+        are those of left_data, in the same order.
     """
-    def __init__(self, matched_data, left_id_field, right_id_field):
-        self.matched_data = matched_data
+    def __init__(self, positions, left_data, left_id_field, right_data, right_id_field, stats=None, interned=None,
+                 left_source=None, right_source=None, deduplicated=False):
+        self.positions = positions
+        self.left_data = left_data
         self.left_id_field = left_id_field
+        self.right_data = right_data
         self.right_id_field = right_id_field
+        self.stats = stats
+        self.interned = list(interned or [])
+        self.left_source = left_source
+        self.right_source = right_source
+        self.deduplicated = deduplicated
+        self._matched_data = None
+        self._unique_matches = None
+        self._unmatched = None
 
     def __str__(self):
         return "< MatchResult: {} records; {} to {} >".format(
-            len(self.matched_data),
+            len(self),
             self.left_id_field,
             self.right_id_field
         )
 
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def pairs(self):
+        """
+        Returns
+        -------
+        DataFrame: The id of each matched record in left_data and right_data, along with the match type.
+        """
+        return self.with_columns([])
+
+    @property
+    def matched_data(self):
+        """
+        Returns
+        -------
+        DataFrame: Each match, including both unique IDs, match type, and original data columns. Built on first
+            access, then kept.
+        """
+        if self._matched_data is None:
+            self._matched_data = self.to_frame()
+        return self._matched_data
+
+    def to_frame(self):
+        """
+        Returns
+        -------
+        DataFrame: Each match, including both unique IDs, match type, and every original data column. Columns
+            present in both datasets are suffixed with _x (left) and _y (right).
+        """
+        return self._join(self.positions, self._left_columns(), self._right_columns())
+
+    def with_columns(self, columns):
+        """
+        Returns each match along with only the requested original data columns.
+
+        Parameters
+        ----------
+        columns : list of strings
+            Names of columns within left_data and/or right_data. Columns present in both datasets are included from
+            each, suffixed with _x (left) and _y (right).
+
+        Returns
+        -------
+        DataFrame
+        """
+        return self._join(self.positions, *self._split_columns(columns))
+
     @property
     def unique_matches(self):
         """
         Returns
         -------
         DataFrame: Distinct combinations of matches made between left and right datasets, including only the "highest"
-            match type per distinct pair of records.
+            match type per distinct pair of records. Built on first access, then kept.
+        """
+        if self._unique_matches is None:
+            unique = remove_duplicate_matches(
+                self.positions,
+                ['left_position', 'right_position']
+            )
+            self._unique_matches = self._join(unique, self._left_columns(), self._right_columns())
+        return self._unique_matches
+
+    @property
+    def unmatched(self):
+        """
+        Returns
+        -------
+        DataFrame: Rows and columns from right_data where no match was made to left_data. Built on first access,
+            then kept.
+        """
+        if self._unmatched is None:
+            matched = np.zeros(len(self.right_data), dtype=bool)
+            matched[self.positions['right_position'].to_numpy()] = True
+            unmatched = fetch_columns(
+                self.right_data, self.right_source, np.flatnonzero(~matched), self._right_columns()
+            )
+            self._unmatched = decode_columns(unmatched, self.interned)
+        return self._unmatched
+
+    def match_to_multiple(self, clusters=False):
+        """
+        Identifies ambiguous matches: records in right_data matched to more than one record in left_data, and records
+        in left_data matched by more than one record in right_data. Only distinct pairs of records are counted,
+        however many match types matched them.
+
+        Parameters
+        ----------
+        clusters : bool, default False
+            If True, the matched records are also grouped into clusters; see clusters.
+
+        Returns
+        -------
+        dictionary of DataFrames, with keys:
+            'right_to_many' - the id of each record in right_data matched to several records in left_data, along with
+                their number, left_count
+            'left_to_many' - the id of each record in left_data matched by several records in right_data, along with
+                their number, right_count
+            'clusters' - as returned by clusters (only if clusters is True)
+        """
+        left_positions, right_positions = self._distinct_pairs()
+        left_counts = np.bincount(right_positions, minlength=len(self.right_data))
+        right_counts = np.bincount(left_positions, minlength=len(self.left_data))
+        right_to_many = np.flatnonzero(left_counts > 1)
+        left_to_many = np.flatnonzero(right_counts > 1)
+        report = {
+            'right_to_many': pd.DataFrame({
+                self.right_id_field: self.right_data[self.right_id_field].to_numpy()[right_to_many],
+                'left_count': left_counts[right_to_many]
+            }),
+            'left_to_many': pd.DataFrame({
+                self.left_id_field: self.left_data[self.left_id_field].to_numpy()[left_to_many],
+                'right_count': right_counts[left_to_many]
+            })
+        }
+        if clusters:
+            report['clusters'] = self.clusters()
+        return report
+
+    def clusters(self):
+        """
+        Groups matched records into clusters (connected components), each probably describing a single entity: two
+        records share a cluster whenever they are linked by a chain of matches, however long. When deduplicating,
+        each record of right_data is the same record of left_data, so clusters are groups of duplicate records.
+
+        Returns
+        -------
+        DataFrame: Each distinct pair of matched records, identified by both unique IDs, along with the cluster to
+            which it belongs. Clusters are numbered from 0 in order of their first record in left_data, and pairs are
+            ordered by cluster, then by left record, then by right record.
         """
-        return remove_duplicate_matches(
-            self.matched_data,
-            [self.left_id_field, self.right_id_field]
+        left_positions, right_positions = self._distinct_pairs()
+        if self.deduplicated:
+            labels = _connected_components(left_positions, right_positions, len(self.left_data))
+        else:
+            # Records of left_data and right_data are nodes of a single graph, those of right_data following.
+            labels = _connected_components(
+                left_positions, right_positions + len(self.left_data), len(self.left_data) + len(self.right_data)
+            )
+        cluster = pd.factorize(labels[left_positions], sort=True)[0]
+        order = np.lexsort((right_positions, left_positions, cluster))
+        return pd.DataFrame({
+            'cluster': cluster[order],
+            self.left_id_field: self.left_data[self.left_id_field].to_numpy()[left_positions[order]],
+            self.right_id_field: self.right_data[self.right_id_field].to_numpy()[right_positions[order]]
+        })
+
+    def _distinct_pairs(self):
+        """
+        Returns the positions of each distinct pair of matched records, ordered by left position, then by right
+        position.
+        """
+        pairs = np.unique(
+            self.positions['left_position'].to_numpy(dtype=np.int64) * len(self.right_data)
+            + self.positions['right_position'].to_numpy(dtype=np.int64)
         )
+        return pairs // max(1, len(self.right_data)), pairs % max(1, len(self.right_data))
 
+    def to_parquet(self, path, columns=None, batch_size=100000):
+        """
+        Writes each match to a Parquet file, batch_size matches at a time, so that the full set of matches (and
+        their original data) need never be held in memory at once. Requires pyarrow.
 
+        Parameters
+        ----------
+        path : string
+            Location of the file to write.
+        columns : list of strings (optional), default None
+            Original data columns to include alongside the ids and match type, as for with_columns. If not
+            provided, only the ids and match type are written.
+        batch_size : int, default 100000
+            Number of matches joined to their original data and written at a time.
+        """
+        left_columns, right_columns = self._split_columns(columns or [])
+        # Types are taken from the whole of each column, rather than from any one batch.
+        left_fields = [self.left_id_field] + [column for column in left_columns if column != self.left_id_field]
+        right_fields = [self.right_id_field] + [column for column in right_columns if column != self.right_id_field]
+        left_types = arrow_types(self.left_data, self.left_source, left_fields)
+        right_types = arrow_types(self.right_data, self.right_source, right_fields)
+        types = (
+            left_types[:1] + right_types[:1] + arrow_types(self.positions, None, ['match_type']) +
+            left_types[1:] + right_types[1:]
+        )
+        # An empty result is still written, with no rows.
+        starts = range(0, max(len(self), 1), batch_size)
+        write_parquet(
+            (
+                self._join(self.positions.iloc[start:start + batch_size], left_columns, right_columns)
+                for start in starts
+            ),
+            path,
+            types
+        )
+
+    def _split_columns(self, columns):
+        """
+        Returns the requested columns present in left_data, and those present in right_data.
+        """
+        left_columns = [column for column in columns if column in self._left_columns()]
+        right_columns = [column for column in columns if column in self._right_columns()]
+        for column in columns:
+            if column not in left_columns and column not in right_columns:
+                raise ValueError("Field {} not present in left or right data.".format(column))
+        return left_columns, right_columns
 
+    def _left_columns(self):
+        return all_columns(self.left_data, self.left_source)
+
+    def _right_columns(self):
+        return all_columns(self.right_data, self.right_source)
+
+    def _join(self, positions, left_columns, right_columns):
+        """
+        Builds a DataFrame of the given matches, laid out as the ids and match type followed by the requested
+        columns of left_data and right_data. The index of positions is kept.
+        """
+        left_columns = [column for column in left_columns if column != self.left_id_field]
+        right_columns = [column for column in right_columns if column != self.right_id_field]
+        left = decode_columns(
+            fetch_columns(
+                self.left_data,
+                self.left_source,
+                positions['left_position'].to_numpy(),
+                [self.left_id_field] + left_columns
+            ),
+            self.interned
+        )
+        right = decode_columns(
+            fetch_columns(
+                self.right_data,
+                self.right_source,
+                positions['right_position'].to_numpy(),
+                [self.right_id_field] + right_columns
+            ),
+            self.interned
+        )
+        overlap = set(left_columns) & set(right_columns)
+        data = {
+            self.left_id_field: left[self.left_id_field].array,
+            self.right_id_field: right[self.right_id_field].array,
+            'match_type': positions['match_type'].to_numpy(),
+        }
+        for column in left_columns:
+            data[column + '_x' if column in overlap else column] = left[column].array
+        for column in right_columns:
+            data[column + '_y' if column in overlap else column] = right[column].array
+        return pd.DataFrame(data, index=positions.index)
@@ -0,0 +1,120 @@
+SOUNDEX_DIGITS = {
+    letter: digit
+    for digit, letters in [('1', 'BFPV'), ('2', 'CGJKQSXZ'), ('3', 'DT'), ('4', 'L'), ('5', 'MN'), ('6', 'R')]
+    for letter in letters
+}
+VOWELS = 'AEIOU'
+
+
+def _letters(value):
+    return ''.join(character for character in str(value).upper() if 'A' <= character <= 'Z')
+
+
+def soundex(value):
+    """
+    Returns the American Soundex code of a string, eg soundex('Robert') == 'R163', or None if it holds no letters.
+    """
+    letters = _letters(value)
+    if not letters:
+        return None
+    code = letters[0]
+    previous = SOUNDEX_DIGITS.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = SOUNDEX_DIGITS.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+        # Letters coded the same are only coded once when separated by H or W, but twice when separated by a vowel.
+        if letter not in 'HW':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def metaphone(value):
+    """
+    Returns the Metaphone code of a string (following Lawrence Philips' original rules), eg metaphone('Knight') ==
+    'NT', or None if it holds no letters.
+    """
+    word = _letters(value)
+    if not word:
+        return None
+    if word[:2] in ('AE', 'GN', 'KN', 'PN', 'WR'):
+        word = word[1:]
+    elif word[0] == 'X':
+        word = 'S' + word[1:]
+    elif word[:2] == 'WH':
+        word = 'W' + word[2:]
+
+    code = []
+    for i, letter in enumerate(word):
+        before = word[i - 1] if i > 0 else ''
+        after = word[i + 1] if i + 1 < len(word) else ''
+        after_next = word[i + 2] if i + 2 < len(word) else ''
+        # Doubled letters are coded once, except for C.
+        if letter == before and letter != 'C':
+            continue
+        if letter in VOWELS:
+            if i == 0:
+                code.append(letter)
+        elif letter == 'B':
+            if not (before == 'M' and i == len(word) - 1):
+                code.append('B')
+        elif letter == 'C':
+            if after == 'I' and after_next == 'A':
+                code.append('X')
+            elif after == 'H':
+                code.append('K' if before == 'S' else 'X')
+            elif after in 'IEY' and after:
+                if before != 'S':
+                    code.append('S')
+            else:
+                code.append('K')
+        elif letter == 'D':
+            code.append('J' if after == 'G' and after_next in 'EYI' and after_next else 'T')
+        elif letter == 'G':
+            if after == 'H' and after_next and after_next not in VOWELS:
+                continue
+            if after == 'N' and (i + 2 == len(word) or word[i + 2:] == 'ED'):
+                continue
+            if before == 'D' and after in 'EYI' and after:
+                continue
+            code.append('J' if after in 'IEY' and after and before != 'G' else 'K')
+        elif letter == 'H':
+            if before not in 'CSPTG' and after in VOWELS and after:
+                code.append('H')
+        elif letter == 'K':
+            if before != 'C':
+                code.append('K')
+        elif letter == 'P':
+            code.append('F' if after == 'H' else 'P')
+        elif letter == 'Q':
+            code.append('K')
+        elif letter == 'S':
+            if after == 'H' or (after == 'I' and after_next in ('O', 'A') and after_next):
+                code.append('X')
+            else:
+                code.append('S')
+        elif letter == 'T':
+            if after == 'I' and after_next in ('O', 'A') and after_next:
+                code.append('X')
+            elif after == 'H':
+                code.append('0')
+            elif not (after == 'C' and after_next == 'H'):
+                code.append('T')
+        elif letter == 'V':
+            code.append('F')
+        elif letter in 'WY':
+            if after in VOWELS and after:
+                code.append(letter)
+        elif letter == 'X':
+            code.append('KS')
+        elif letter == 'Z':
+            code.append('S')
+        else:
+            code.append(letter)
+    return ''.join(code) or None
+
+
+ENCODERS = {
+    'soundex': soundex,
+    'metaphone': metaphone,
+}
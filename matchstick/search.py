@@ -0,0 +1,298 @@
+from collections import Counter
+from functools import partial
+import numpy as np
+import Levenshtein
+
+# Recent releases of Levenshtein can stop computing a distance as soon as it exceeds a limit.
+try:
+    Levenshtein.distance('', '', score_cutoff=0)
+    BOUNDED_LEVENSHTEIN = True
+except TypeError:
+    BOUNDED_LEVENSHTEIN = False
+
+
+class BKTree(object):
+    """
+    BKTree (Burkhard-Keller tree) indexes a set of distinct strings by their Levenshtein distance from one another,
+    so that every string within a given distance of a query can be found without comparing against every string.
+
+    Parameters
+    ----------
+    values : list or array of strings
+        Distinct strings to index. Searches return positions within values.
+    """
+    def __init__(self, values):
+        self.values = values
+        self.root = None
+        for code, value in enumerate(values):
+            self._insert(code, value)
+
+    def _insert(self, code, value):
+        # Each node is a pair of the position of its string, and its children keyed by distance from that string.
+        if self.root is None:
+            self.root = (code, {})
+            return
+        node = self.root
+        while True:
+            distance = Levenshtein.distance(value, self.values[node[0]])
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (code, {})
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """
+        Returns the positions of every indexed string within max_distance of value.
+        """
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            code, children = stack.pop()
+            distance = Levenshtein.distance(value, self.values[code])
+            if distance <= max_distance:
+                found.append(code)
+            # By the triangle inequality, matches can only lie beneath children at a similar distance.
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class SymSpellIndex(object):
+    """
+    SymSpellIndex indexes a set of distinct strings by every variant produced by deleting up to max_distance
+    characters (symmetric delete). Any two strings within max_distance of one another share at least one such
+    variant, so candidates are found by looking up the variants of the query, then confirmed by computing distances.
+
+    Parameters
+    ----------
+    values : list or array of strings
+        Distinct strings to index. Searches return positions within values.
+    max_distance : int
+        Largest distance which may be searched for.
+    """
+    def __init__(self, values, max_distance):
+        self.values = values
+        self.max_distance = max_distance
+        self.variants = {}
+        for code, value in enumerate(values):
+            for variant in deletion_variants(value, max_distance):
+                self.variants.setdefault(variant, []).append(code)
+
+    def search(self, value, max_distance):
+        """
+        Returns the positions of every indexed string within max_distance of value.
+        """
+        assert max_distance <= self.max_distance
+        candidates = set()
+        for variant in deletion_variants(value, max_distance):
+            candidates.update(self.variants.get(variant, ()))
+        distance = Levenshtein.distance
+        if BOUNDED_LEVENSHTEIN:
+            distance = partial(distance, score_cutoff=max_distance)
+        return [code for code in candidates if distance(value, self.values[code]) <= max_distance]
+
+
+def deletion_variants(value, max_distance):
+    """
+    Returns every string produced by deleting up to max_distance characters from value, including value itself.
+    """
+    variants = {value}
+    current = {value}
+    for _ in range(max_distance):
+        current = {variant[:i] + variant[i + 1:] for variant in current for i in range(len(variant))}
+        variants |= current
+    return variants
+
+
+def ngrams(value, ngram_size):
+    """
+    Returns the character n-grams of a string, lower-cased and padded with a space at either end, eg
+    ngrams('Ann', 3) == [' an', 'ann', 'nn '].
+    """
+    padded = ' {} '.format(value.lower())
+    return [padded[i:i + ngram_size] for i in range(max(1, len(padded) - ngram_size + 1))]
+
+
+class NgramIndex(object):
+    """
+    NgramIndex represents each of a set of distinct strings as a vector of the TF-IDF weights of its character
+    n-grams, normalized to unit length, and indexes the vectors by n-gram (an inverted index, equivalent to a sparse
+    matrix held by column) as well as by string (equivalent to the same matrix held by row).
+
+    Strings similar to a query are found by prefix filtering: any string with cosine similarity of at least the
+    threshold must share one of the query's rarest n-grams, chosen such that the remaining n-grams could not reach
+    the threshold by themselves. Only the strings holding those few n-grams are scored, by multiplying their
+    weights with those of the query.
+
+    Parameters
+    ----------
+    values : list or array of strings
+        Distinct strings to index. Searches return positions within values.
+    ngram_size : int
+        Number of characters in each n-gram.
+    """
+    def __init__(self, values, ngram_size):
+        self.ngram_size = ngram_size
+        self.n_values = len(values)
+        self.vocabulary = {}
+        grams = []
+        owners = []
+        for code, value in enumerate(values):
+            for gram in ngrams(value, ngram_size):
+                grams.append(self.vocabulary.setdefault(gram, len(self.vocabulary)))
+                owners.append(code)
+        n_grams = len(self.vocabulary)
+        # Repeated n-grams within a string are combined, counting their occurrences. Entries are ordered by string.
+        entries, counts = np.unique(
+            np.array(owners, dtype=np.int64) * n_grams + np.array(grams, dtype=np.int64), return_counts=True
+        )
+        owners = entries // max(n_grams, 1)
+        grams = entries % max(n_grams, 1)
+        self.document_frequency = np.bincount(grams, minlength=n_grams)
+        self.idf = self._idf(self.document_frequency)
+        weights = counts * self.idf[grams]
+        norms = np.sqrt(np.bincount(owners, weights=weights ** 2, minlength=self.n_values))
+        weights = weights / norms[owners]
+        self.max_weights = np.zeros(n_grams)
+        np.maximum.at(self.max_weights, grams, weights)
+        # Entries held by each string occupy a contiguous run...
+        self.grams = grams
+        self.gram_weights = weights
+        self.value_offsets = np.concatenate([[0], np.cumsum(np.bincount(owners, minlength=self.n_values))])
+        # ...as do those holding each n-gram.
+        order = np.argsort(grams, kind='stable')
+        self.owners = owners[order]
+        self.offsets = np.concatenate([[0], np.cumsum(self.document_frequency)]).astype(np.int64)
+
+    def _idf(self, document_frequency):
+        # Smoothed, so that n-grams not held by any indexed string are given a finite (and the largest) weight.
+        return np.log((1 + self.n_values) / (1 + document_frequency)) + 1
+
+    def _query_weights(self, values):
+        """
+        Returns the weights of the n-grams of each query which are held by indexed strings, as the positions of the
+        queries, the n-grams, and their weights. Weights are normalized over every n-gram of a query, including
+        those not held by any indexed string.
+        """
+        owners = []
+        grams = []
+        weights = []
+        unknown_weight = self._idf(0)
+        for code, value in enumerate(values):
+            counts = Counter(ngrams(value, self.ngram_size))
+            known = [(self.vocabulary[gram], count) for gram, count in counts.items() if gram in self.vocabulary]
+            query_grams = np.array([gram for gram, _ in known], dtype=np.int64)
+            query_weights = np.array([count for _, count in known], dtype=np.float64) * self.idf[query_grams]
+            unknown_counts = np.array([count for gram, count in counts.items() if gram not in self.vocabulary])
+            norm = np.sqrt((query_weights ** 2).sum() + ((unknown_counts * unknown_weight) ** 2).sum())
+            owners.append(np.full(len(known), code, dtype=np.int64))
+            grams.append(query_grams)
+            weights.append(query_weights / norm)
+        if not owners:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        return np.concatenate(owners), np.concatenate(grams), np.concatenate(weights)
+
+    def _prefixes(self, owners, grams, weights, threshold):
+        """
+        Returns whether each n-gram of each query must be looked up: the rarest n-grams of the query, until those
+        remaining could not reach threshold by themselves. Entries must be ordered by query, then by increasing
+        document frequency.
+        """
+        first = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else np.array([], dtype=int)
+        group_sizes = np.diff(np.r_[first, len(owners)])
+
+        def remaining(values):
+            # Sum of each value and those after it for the same query.
+            preceding = np.cumsum(values) - values
+            totals = np.add.reduceat(values, first) if len(values) else values
+            return np.repeat(totals + preceding[first], group_sizes) - preceding
+
+        # Similarity through a set of n-grams is at most the sum of the query weights multiplied by the largest
+        # weight of each n-gram, and at most the length of the query vector restricted to them (as indexed vectors
+        # are of unit length).
+        bounds = np.minimum(remaining(weights * self.max_weights[grams]), np.sqrt(remaining(weights ** 2)))
+        return bounds >= threshold - 1e-9
+
+    def search(self, values, threshold, batch_size=1000000):
+        """
+        Returns every pair of a query and an indexed string whose cosine similarity is at least threshold (allowing
+        for rounding), as the positions of the queries within values, the positions of the indexed strings, and
+        their similarities. Queries are searched in batches, each looking up at most batch_size entries of the
+        inverted index (or a single query, should it alone need more), so that memory use is bounded by the size
+        of a batch.
+
+        Parameters
+        ----------
+        values : list or array of strings
+            Queries to search for.
+        threshold : float
+            Smallest cosine similarity to return, greater than 0.
+        batch_size : int, default 1000000
+
+        Returns
+        -------
+        tuple of three numpy arrays : query positions, indexed positions and similarities
+        """
+        owners, grams, weights = self._query_weights(values)
+        order = np.lexsort((self.document_frequency[grams], owners))
+        owners, grams, weights = owners[order], grams[order], weights[order]
+        prefixes = self._prefixes(owners, grams, weights, threshold)
+        starts = self.offsets[grams]
+        counts = np.where(prefixes, self.offsets[grams + 1] - starts, 0)
+        # Entries for each query are contiguous, so batches are formed from consecutive queries. Candidates are
+        # marked, and queries held, in dense arrays whose size is also bounded by batch_size.
+        query_starts = np.searchsorted(owners, np.arange(len(values) + 1))
+        cumulative = np.concatenate([[0], np.cumsum(counts)])[query_starts]
+        max_queries = max(1, batch_size // max(self.n_values, len(self.vocabulary), 1))
+        found = []
+        start = 0
+        while start < len(values):
+            stop = max(start + 1, np.searchsorted(cumulative, cumulative[start] + batch_size, side='right') - 1)
+            stop = min(stop, start + max_queries)
+            batch = slice(query_starts[start], query_starts[stop])
+            batch_owners = owners[batch] - start
+            batch_counts = counts[batch]
+            entries = run_positions(starts[batch], batch_counts)
+            candidates = np.zeros((stop - start) * self.n_values, dtype=bool)
+            candidates[np.repeat(batch_owners, batch_counts) * self.n_values + self.owners[entries]] = True
+            candidates = np.flatnonzero(candidates)
+            candidate_queries = candidates // self.n_values
+            candidate_values = candidates % self.n_values
+
+            # Each candidate is scored by multiplying the weights of the n-grams held by the indexed string with
+            # those of the query, held densely for every query in the batch.
+            n_grams = len(self.vocabulary)
+            queries = np.zeros((stop - start) * n_grams)
+            queries[batch_owners * n_grams + grams[batch]] = weights[batch]
+            value_counts = self.value_offsets[candidate_values + 1] - self.value_offsets[candidate_values]
+            entries = run_positions(self.value_offsets[candidate_values], value_counts)
+            products = queries[np.repeat(candidate_queries * n_grams, value_counts) + self.grams[entries]]
+            # Every string holds at least one n-gram, so no run is empty.
+            similarities = np.add.reduceat(
+                products * self.gram_weights[entries], np.cumsum(value_counts) - value_counts
+            )
+            keep = similarities >= threshold - 1e-9
+            found.append((
+                candidate_queries[keep] + start, candidate_values[keep], np.minimum(similarities[keep], 1.0)
+            ))
+            start = stop
+        if not found:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        return tuple(np.concatenate([batch[i] for batch in found]) for i in range(3))
+
+
+def run_positions(starts, counts):
+    """
+    Returns the positions of every element of the runs of the given starts and lengths, one run after another.
+    """
+    return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+
+
+ENGINES = {
+    'bktree': lambda values, max_distance: BKTree(values),
+    'symspell': SymSpellIndex,
+}
@@ -0,0 +1,260 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+from .match import Matcher
+
+
+def match_records(matcher, match_criteria, records):
+    """
+    Matches a batch of right records against the left_data of a Matcher in a single call to create_matches,
+    returning the matches of each record in turn.
+
+    Parameters
+    ----------
+    matcher : Matcher
+    match_criteria : list of dictionaries
+        See Matcher.create_matches.
+    records : list of dictionaries
+        Values of the fields used by match_criteria for each right record. Any right_id_field is ignored.
+
+    Returns
+    -------
+    list of lists of tuples
+        For each record, the id of each matched record in left_data along with the match type, as for
+        Matcher.match_one.
+    """
+    right_data = pd.DataFrame(records)
+    right_data[matcher.right_id_field] = np.arange(len(records))
+    positions = matcher.create_matches(match_criteria, right_data=right_data).positions
+    left_ids = matcher.left_data[matcher.left_id_field].to_numpy()[positions['left_position'].to_numpy()]
+    matches = [[] for _ in records]
+    # Matches are ordered by match type, then by left position, and keep that order for each record.
+    for right_position, left_id, match_type in zip(
+        positions['right_position'].tolist(), left_ids.tolist(), positions['match_type'].tolist()
+    ):
+        matches[right_position].append((left_id, match_type))
+    return matches
+
+
+# Placed on the queue of requests by MatchService.close, to stop the collector.
+_CLOSE = object()
+
+_worker_matcher = None
+_worker_criteria = None
+
+
+def _initialize_worker(matcher, match_criteria):
+    global _worker_matcher, _worker_criteria
+    _worker_matcher = matcher
+    _worker_criteria = match_criteria
+
+
+def _match_in_worker(records):
+    return match_records(_worker_matcher, _worker_criteria, records)
+
+
+class MatchService(object):
+    """
+    MatchService is an asyncio front-end to a Matcher holding a resident population (left_data), for serving many
+    small match requests at once. Requests arriving within max_wait seconds of one another are coalesced into a
+    single batch, matched by one call to create_matches in a pool of threads (or processes), and the matches of each
+    record then returned to the request which made it. The cost of building DataFrames and indexes for each call is
+    so shared between every request in the batch.
+
+    Use as an asynchronous context manager, so that the pool is shut down once finished, eg
+
+        async with MatchService(matcher, match_criteria) as service:
+            matches = await service.match_one({'first_name': 'Jake', 'last_name': 'Smyth'})
+
+    Parameters
+    ----------
+    matcher : Matcher
+        Holds the population matched against. Its right_data is not used. Indexes on left_data are shared by every
+        batch; see LeftIndex.prepare to build them before serving.
+    match_criteria : list of dictionaries
+        See Matcher.create_matches.
+    max_batch_size : int, default 1000
+        Largest number of records matched in a single batch. A batch is matched as soon as it reaches this size,
+        and a single request larger than this is matched alone.
+    max_wait : float, default 0.005
+        Longest time, in seconds, for which the first request of a batch waits for others to join it.
+    executor : concurrent.futures.Executor (optional), default None
+        Pool in which batches are matched. If not provided, a pool of max_workers threads is used, and shut down
+        when the service is closed. A ProcessPoolExecutor must be created by MatchService.process_pool, so that each
+        process holds the Matcher.
+    max_workers : int (optional), default None
+        Number of threads in the pool used if executor is not provided.
+    """
+    def __init__(self, matcher, match_criteria, max_batch_size=1000, max_wait=0.005, executor=None,
+                 max_workers=None):
+        Matcher.validate_match_criteria(match_criteria)
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        if max_wait < 0:
+            raise ValueError("max_wait must not be negative.")
+        self.matcher = matcher
+        self.match_criteria = match_criteria
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor or ThreadPoolExecutor(max_workers)
+        self._owns_executor = executor is None
+        self.requests = 0
+        self.records = 0
+        self.batches = 0
+        self._queue = None
+        self._collector = None
+        self._dispatches = set()
+
+    def __str__(self):
+        return "< MatchService: {} requests; {} records; {} batches >".format(
+            self.requests,
+            self.records,
+            self.batches
+        )
+
+    @staticmethod
+    def process_pool(matcher, match_criteria, max_workers=None):
+        """
+        Returns a ProcessPoolExecutor for use by a MatchService, each of whose processes holds the Matcher and match
+        criteria, so that only the records of each batch are sent to a process. Processes are forked where possible,
+        inheriting the Matcher (and any lambdas within match criteria) without pickling.
+
+        Returns
+        -------
+        ProcessPoolExecutor
+        """
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        return ProcessPoolExecutor(
+            max_workers, mp_context=context, initializer=_initialize_worker, initargs=(matcher, match_criteria)
+        )
+
+    async def match(self, records):
+        """
+        Matches a batch of right records, along with those of any other requests arriving at around the same time.
+
+        Parameters
+        ----------
+        records : list of dictionaries
+            Values of the fields used by match_criteria for each right record.
+
+        Returns
+        -------
+        list of lists of tuples
+            For each record, the id of each matched record in left_data along with the match type, ordered by match
+            type and then by position within left_data (as for Matcher.match_one).
+        """
+        records = list(records)
+        self.requests += 1
+        if not records:
+            return []
+        if self._collector is None:
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.ensure_future(self._collect())
+        future = asyncio.get_event_loop().create_future()
+        self._queue.put_nowait((records, future))
+        return await future
+
+    async def match_one(self, record):
+        """
+        Matches a single right record; see match.
+
+        Returns
+        -------
+        list of tuples
+        """
+        return (await self.match([record]))[0]
+
+    async def close(self):
+        """
+        Waits for every request already made to be matched, then shuts down the pool (if owned by the service).
+        """
+        if self._collector is not None:
+            # The collector dispatches the batch it is gathering before it stops.
+            self._queue.put_nowait(_CLOSE)
+            await self._collector
+            self._collector = None
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches)
+        # Requests made while closing are matched as a final batch.
+        while self._queue is not None and not self._queue.empty():
+            await self._dispatch(self._next_batch_nowait())
+        if self._owns_executor:
+            self.executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _next_batch_nowait(self):
+        requests = [self._queue.get_nowait()]
+        size = len(requests[0][0])
+        while size < self.max_batch_size and not self._queue.empty():
+            requests.append(self._queue.get_nowait())
+            size += len(requests[-1][0])
+        return requests
+
+    async def _collect(self):
+        """
+        Gathers requests into batches, dispatching each without waiting for the last to be matched, until the
+        service is closed.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            request = await self._queue.get()
+            if request is _CLOSE:
+                return
+            requests = [request]
+            size = len(request[0])
+            closing = False
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if request is _CLOSE:
+                    closing = True
+                    break
+                requests.append(request)
+                size += len(request[0])
+            dispatch = asyncio.ensure_future(self._dispatch(requests))
+            self._dispatches.add(dispatch)
+            dispatch.add_done_callback(self._dispatches.discard)
+            if closing:
+                return
+
+    async def _dispatch(self, requests):
+        """
+        Matches the records of a batch of requests in the pool, then returns the matches of each request to it.
+        """
+        records = [record for request_records, _ in requests for record in request_records]
+        self.records += len(records)
+        self.batches += 1
+        if isinstance(self.executor, ProcessPoolExecutor):
+            task = partial(_match_in_worker, records)
+        else:
+            task = partial(match_records, self.matcher, self.match_criteria, records)
+        try:
+            matches = await asyncio.get_event_loop().run_in_executor(self.executor, task)
+        except Exception as e:
+            # Every request in the batch fails, as it would had it been matched alone.
+            for _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        start = 0
+        for request_records, future in requests:
+            if not future.done():
+                future.set_result(matches[start:start + len(request_records)])
+            start += len(request_records)
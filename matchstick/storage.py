@@ -0,0 +1,214 @@
+import copy
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise ImportError("Reading and writing Parquet or Arrow files requires pyarrow.")
+
+
+class ColumnarFile(object):
+    """
+    ColumnarFile is a Parquet or Arrow IPC (Feather) file from which columns are read only as they are needed, so
+    that datasets larger than memory can be matched: the id and matching columns are read up front, and every other
+    column only for those records which appear in results. Files are memory-mapped.
+
+    Parameters
+    ----------
+    path : string
+        Location of the file.
+    file_format : string (optional), default None
+        Either 'parquet' or 'arrow'. If not provided, files ending .parquet or .pq are read as Parquet, and all
+        others as Arrow IPC.
+    """
+    def __init__(self, path, file_format=None):
+        _require_pyarrow()
+        self.path = path
+        self.file_format = file_format or ('parquet' if path.endswith(PARQUET_EXTENSIONS) else 'arrow')
+        # Name of each renamed column within the file.
+        self._names = {}
+        if self.file_format == 'parquet':
+            self._file = pyarrow.parquet.ParquetFile(path, memory_map=True)
+            self.columns = list(self._file.schema_arrow.names)
+            row_group_sizes = [
+                self._file.metadata.row_group(i).num_rows for i in range(self._file.metadata.num_row_groups)
+            ]
+            self._row_group_offsets = np.concatenate([[0], np.cumsum(row_group_sizes)]).astype(np.int64)
+        elif self.file_format == 'arrow':
+            # Reading from a memory map does not copy column data into memory.
+            self._table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+            self.columns = list(self._table.column_names)
+        else:
+            raise ValueError("Unknown file format {}.".format(file_format))
+
+    def __str__(self):
+        return "< ColumnarFile: {} records; {} columns; {} >".format(len(self), len(self.columns), self.path)
+
+    def __len__(self):
+        if self.file_format == 'parquet':
+            return int(self._row_group_offsets[-1])
+        return self._table.num_rows
+
+    def rename(self, columns):
+        """
+        Returns a copy of this ColumnarFile whose columns are renamed as given, reading the same file.
+
+        Parameters
+        ----------
+        columns : dictionary
+            New name of each column renamed.
+
+        Returns
+        -------
+        ColumnarFile
+        """
+        renamed = copy.copy(self)
+        renamed.columns = [columns.get(column, column) for column in self.columns]
+        renamed._names = {columns.get(column, column): self._names.get(column, column) for column in self.columns}
+        return renamed
+
+    def column_type(self, column):
+        """
+        Returns the Arrow type of a column.
+        """
+        schema = self._file.schema_arrow if self.file_format == 'parquet' else self._table.schema
+        return schema.field(self._names.get(column, column)).type
+
+    def read(self, columns, positions=None):
+        """
+        Reads the provided columns, for every record or only those at the given positions.
+
+        Parameters
+        ----------
+        columns : list of strings
+        positions : numpy array of integers (optional), default None
+            Positions of the records to read, in the order they should be returned.
+
+        Returns
+        -------
+        DataFrame
+        """
+        for column in columns:
+            if column not in self.columns:
+                raise ValueError("Field {} not present in {}.".format(column, self.path))
+        frame = self._read([self._names.get(column, column) for column in columns], positions)
+        frame.columns = columns
+        return frame
+
+    def _read(self, columns, positions):
+        if self.file_format == 'arrow':
+            table = self._table.select(columns)
+            if positions is not None:
+                table = table.take(pyarrow.array(positions, type=pyarrow.int64()))
+            return table.to_pandas()
+        if positions is None:
+            return self._file.read(columns=columns).to_pandas()
+        # Only the row groups holding the requested records are read.
+        positions = np.asarray(positions, dtype=np.int64)
+        groups = np.unique(np.searchsorted(self._row_group_offsets, positions, side='right') - 1)
+        group_sizes = self._row_group_offsets[groups + 1] - self._row_group_offsets[groups]
+        # Position of each record within the concatenation of the row groups read.
+        group_starts = np.concatenate([[0], np.cumsum(group_sizes)[:-1]])
+        group_of = np.searchsorted(self._row_group_offsets[groups], positions, side='right') - 1
+        relative = group_starts[group_of] + positions - self._row_group_offsets[groups][group_of]
+        table = self._file.read_row_groups(list(groups), columns=columns)
+        return table.take(pyarrow.array(relative, type=pyarrow.int64())).to_pandas()
+
+
+def read_data(data, columns=None):
+    """
+    Returns the DataFrame to be held in memory for a dataset given as a DataFrame, list of dictionaries, path to a
+    Parquet or Arrow file, or ColumnarFile, along with the ColumnarFile itself (or None).
+
+    Parameters
+    ----------
+    data : DataFrame, list of dictionaries, string, or ColumnarFile
+    columns : list of strings (optional), default None
+        For files, the columns to read into memory; every column if not provided. Columns not present in the file
+        are ignored, so that the same list may be used for both datasets.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data, None
+    if isinstance(data, str):
+        data = ColumnarFile(data)
+    if isinstance(data, ColumnarFile):
+        if columns is None:
+            columns = data.columns
+        return data.read([column for column in data.columns if column in columns]), data
+    return pd.DataFrame(data), None
+
+
+def fetch_columns(data, source, positions, columns):
+    """
+    Returns the provided columns for the records at the given positions, taken from data where it holds them and
+    otherwise read from source.
+    """
+    frame = data[[column for column in columns if column in data.columns]].iloc[positions].reset_index(drop=True)
+    missing = [column for column in columns if column not in data.columns]
+    if missing:
+        fetched = source.read(missing, positions)
+        for column in missing:
+            frame[column] = fetched[column].array
+    return frame[columns]
+
+
+def all_columns(data, source):
+    """
+    Returns the names of every column of a dataset, including those of its source which are not held in data.
+    """
+    if source is None:
+        return list(data.columns)
+    return list(data.columns) + [column for column in source.columns if column not in data.columns]
+
+
+def arrow_types(data, source, columns):
+    """
+    Returns the Arrow type of each of the provided columns of a dataset, taken from the whole of each column: from
+    source where data does not hold it, and otherwise inferred from the values in data. Interned columns take the
+    type of their original values.
+    """
+    _require_pyarrow()
+    types = []
+    for column in columns:
+        if column not in data.columns:
+            types.append(source.column_type(column))
+            continue
+        values = data[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = pd.Series(values.cat.categories)
+        schema = pyarrow.Schema.from_pandas(pd.DataFrame({column: values}), preserve_index=False)
+        types.append(schema.field(column).type)
+    return types
+
+
+def write_parquet(frames, path, types=None):
+    """
+    Writes a sequence of DataFrames sharing the same columns to a single Parquet file, one at a time, so that only
+    one need be held in memory. Every frame is written with the same schema: that of the first frame, or the given
+    Arrow type of each column (see arrow_types), so that a column holding only missing values within one frame does
+    not take a different type from the same column in another.
+    """
+    _require_pyarrow()
+    writer = None
+    schema = None
+    try:
+        for frame in frames:
+            if schema is None and types is not None:
+                schema = pyarrow.schema(list(zip(frame.columns, types)))
+            table = pyarrow.Table.from_pandas(frame, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pyarrow.parquet.ParquetWriter(path, schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
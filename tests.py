@@ -1,8 +1,22 @@
+import asyncio
+import os
+import tempfile
 import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import Levenshtein
 import numpy as np
 import pandas as pd
-from matchstick import Matcher
-from matchstick import crossjoin_dataframes, remove_duplicate_matches
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+from matchstick import Matcher, LeftIndex, MatchService
+from matchstick.phonetic import metaphone, soundex
+from matchstick import crossjoin_dataframes, iter_crossjoin_dataframes, blockjoin_dataframes, remove_duplicate_matches
+from benchmarks.generate import generate_people
 
 
 class TestFunctions(unittest.TestCase):
@@ -25,6 +39,38 @@ class TestFunctions(unittest.TestCase):
         filtered = crossed[(crossed['field1_left'] == 1) & (crossed['field2_left'] == 2)]
         self.assertEqual(len(filtered), 3)
 
+    def test_iter_crossjoin_dataframes(self):
+        df1, df2 = get_levenshtein_data()
+        crossed = crossjoin_dataframes(df1, df2)
+        for max_rows in [1, 2, 4, 9]:
+            blocks = list(iter_crossjoin_dataframes(df1, df2, max_rows))
+            self.assertTrue(all(len(block) <= max_rows for block in blocks))
+            pd.testing.assert_frame_equal(pd.concat(blocks, ignore_index=True), crossed)
+        with self.assertRaises(ValueError):
+            next(iter_crossjoin_dataframes(df1, df2, 0))
+        # Empty products still have the joined columns.
+        for left, right in [(df1.iloc[:0], df2), (df1, df2.iloc[:0])]:
+            blocks = list(iter_crossjoin_dataframes(left, right, 2))
+            pd.testing.assert_frame_equal(pd.concat(blocks, ignore_index=True), crossjoin_dataframes(left, right))
+
+    def test_blockjoin_dataframes(self):
+        df1, df2 = get_levenshtein_data()
+        blocked = blockjoin_dataframes(df1, df2, lambda row: row['first'][:1], suffixes=['_left', '_right'])
+        self.assertEqual(len(blocked), 5)
+        self.assertNotIn('__block0', blocked.columns)
+        blocked = blockjoin_dataframes(df1, df2, ['first', lambda row: row['last'][-1:]], suffixes=['_left', '_right'])
+        self.assertEqual(len(blocked), 1)
+        self.assertEqual(blocked.iloc[0]['id1'], 3)
+        # As within Matcher, records missing a blocking key are never paired.
+        df1.loc[0, 'first'] = None
+        df2.loc[0, 'first'] = None
+        blocked = blockjoin_dataframes(df1, df2, 'first')
+        matched = Matcher(df1, 'id1', df2, 'id2').match_on_field(['first'])
+        self.assertEqual(
+            list(blocked[['id1', 'id2']].itertuples(index=False)),
+            list(matched[['id1', 'id2']].itertuples(index=False))
+        )
+
     def test_remove_duplicate_matches(self):
         df = pd.DataFrame([
             {'id1': 1, 'id2': 1, 'match_type': 1},
@@ -40,10 +86,36 @@ class TestFunctions(unittest.TestCase):
         self.assertEqual(unique.iloc[0]['match_type'], 1)
         self.assertEqual(unique.iloc[1]['match_type'], 2)
         self.assertTrue(np.isnan(unique.iloc[2]['match_type']))
+        self.assertEqual(len(remove_duplicate_matches(df.iloc[:0], ['id1', 'id2'])), 0)
+        # Widely spread ids, and nullable ids with missing values, are kept apart.
+        wide = pd.DataFrame({'id1': [0, 2 ** 24, 5], 'id2': [7, 7, 2 ** 40 - 1], 'match_type': 1})
+        self.assertEqual(len(remove_duplicate_matches(wide, ['id1', 'id2'])), 3)
+        nullable = pd.DataFrame({
+            'id1': pd.array([1, None, None, 1], dtype='Int64'), 'id2': [1, 1, 1, 2], 'match_type': [1, 1, 2, 1]
+        })
+        self.assertEqual(list(remove_duplicate_matches(nullable, ['id1', 'id2']).index), [0, 1, 3])
+
+    def test_remove_duplicate_matches_keeps_first(self):
+        df = pd.DataFrame([
+            {'id1': 1, 'id2': 1, 'match_type': 3, 'order': 0},
+            {'id1': 2, 'id2': 1, 'match_type': 2, 'order': 1},
+            {'id1': 1, 'id2': 1, 'match_type': 2, 'order': 2},
+            {'id1': 1, 'id2': 1, 'match_type': 2, 'order': 3},
+        ])
+        unique = remove_duplicate_matches(df, ['id1', 'id2'])
+        self.assertEqual(list(unique['order']), [1, 2])
 
 
 class TestMatcher(unittest.TestCase):
 
+    def test_phonetic_codes(self):
+        for name, code in [('Robert', 'R163'), ('Rupert', 'R163'), ('Ashcraft', 'A261'), ('Tymczak', 'T522')]:
+            self.assertEqual(soundex(name), code)
+        for name, code in [('Knight', 'NT'), ('Thumb', '0M'), ('Dodge', 'TJ'), ('Phillips', 'FLPS')]:
+            self.assertEqual(metaphone(name), code)
+        self.assertIsNone(soundex('123'))
+        self.assertIsNone(metaphone(''))
+
     def test_validate_match_criteria(self):
         no_method = [{
             'type_id': 1,
@@ -67,6 +139,12 @@ class TestMatcher(unittest.TestCase):
             'method': 'function',
             'function': "You can't call a string!"
         }]
+        invalid_vectorized = [{
+            'type_id': 1,
+            'method': 'function',
+            'function': lambda data: data['first_name'],
+            'vectorized': 'yes'
+        }]
         levenshtein_missing_fields = [{
             'type_id': 1,
             'method': 'levenshtein',
@@ -93,16 +171,33 @@ class TestMatcher(unittest.TestCase):
                 {'field_name': 'first_name', 'precision': '1'},
             ]
         }]
+        jaro_winkler_invalid_threshold = [{
+            'method': 'jaro_winkler',
+            'fields': [{'field_name': 'first_name', 'threshold': 1.5}]
+        }]
+        ngram_cosine_missing_threshold = [{
+            'method': 'ngram_cosine',
+            'fields': ['first_name', 'last_name']
+        }]
+        phonetic_invalid_algorithm = [{
+            'method': 'phonetic',
+            'fields': ['last_name'],
+            'algorithm': 'nysiis'
+        }]
         for bad_match_criteria in [
             no_method,
             invalid_method,
             exact_missing_fields,
             missing_function,
             no_callable,
+            invalid_vectorized,
             levenshtein_missing_fields,
             levenshtein_missing_field_name,
             levenshtein_missing_precision,
-            levenshtein_invalid_precision
+            levenshtein_invalid_precision,
+            jaro_winkler_invalid_threshold,
+            ngram_cosine_missing_threshold,
+            phonetic_invalid_algorithm
         ]:
             with self.assertRaises(AssertionError):
                 Matcher.validate_match_criteria(bad_match_criteria)
@@ -116,6 +211,12 @@ class TestMatcher(unittest.TestCase):
             Matcher(list1, 'id2', list2, 'id2')
         with self.assertRaises(ValueError):
             Matcher(list1, 'id1', list2, 'id1')
+        # The ids of both records of each match must be told apart.
+        same_ids = pd.DataFrame(list2).rename(columns={'id2': 'id1'})
+        with self.assertRaises(ValueError):
+            Matcher(list1, 'id1', same_ids, 'id1')
+        with self.assertRaises(ValueError):
+            Matcher(list1, 'id1', None, 'id1').create_matches(get_match_types(), right_data=same_ids)
 
     def test_exact_field_match(self):
         df1, df2 = get_match_data()
@@ -126,6 +227,21 @@ class TestMatcher(unittest.TestCase):
         self.assertEqual(len(matched), 1)
         self.assertEqual(matched.iloc[0]['field'], 'baz')
 
+    def test_exact_field_match_missing_values(self):
+        df1 = pd.DataFrame([
+            {'id1': 1, 'first': 'Jack', 'last': None},
+            {'id1': 2, 'first': 'Jack', 'last': 'Smith'},
+        ])
+        df2 = pd.DataFrame([
+            {'id2': 100, 'first': 'Jack', 'last': None},
+            {'id2': 101, 'first': 'Jack', 'last': 'Smith'},
+        ])
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        matched = matcher.match_on_field(['first', 'last'])
+        self.assertEqual(list(matched['id1']), [2])
+        self.assertEqual(list(matched['id2']), [101])
+        self.assertEqual(len(matcher.match_on_field(['first'])), 4)
+
     def test_function_match(self):
         df1, df2 = get_match_data()
         matcher = Matcher(df1, 'id1', df2, 'id2')
@@ -138,6 +254,35 @@ class TestMatcher(unittest.TestCase):
         self.assertEqual(matched.iloc[1]['id1'], 2)
         self.assertEqual(matched.iloc[1]['id2'], 101)
 
+    def test_function_match_leaves_data_unchanged(self):
+        df1, df2 = get_match_data()
+        calls = []
+
+        def prefix(row):
+            calls.append(row['field'])
+            return row['field'][:3]
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        first = matcher.match_on_function(prefix)
+        second = matcher.match_on_function(prefix, type_id=2)
+        self.assertEqual(list(df1.columns), ['field', 'id1'])
+        self.assertEqual(list(df2.columns), ['field', 'id2'])
+        self.assertEqual(len(calls), 6)
+        self.assertEqual(list(first['id2']), list(second['id2']))
+
+    def test_vectorized_function_match(self):
+        df1, df2 = get_match_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        matched = matcher.match_on_function(lambda data: data['field'].str[:3], vectorized=True)
+        self.assertEqual(list(matched['id1']), [1, 2, 3])
+        self.assertEqual(list(matched['id2']), [100, 101, 102])
+        result = matcher.create_matches([{
+            'type_id': 1,
+            'method': 'function',
+            'function': lambda data: data['field'].str[:3],
+            'vectorized': True
+        }])
+        self.assertEqual(len(result.matched_data), 3)
+
     def test_levenshtein(self):
         df1, df2 = get_levenshtein_data()
         matcher = Matcher(df1, 'id1', df2, 'id2')
@@ -156,6 +301,197 @@ class TestMatcher(unittest.TestCase):
         self.assertEqual(matched.iloc[0]['id1'], 1)
         self.assertEqual(matched.iloc[0]['id2'], 100)
 
+    def test_levenshtein_distances(self):
+        df1, df2 = get_levenshtein_data()
+        df1.index = ['a', 'b', 'c']
+        df2.index = [7, 3, 5]
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        matched = matcher.levenshtein([
+                {'field_name': 'first', 'precision': 2},
+                {'field_name': 'last', 'precision': 1}
+        ])
+        self.assertEqual(list(matched['id2']), [100, 102])
+        self.assertEqual(list(matched['first_levenshtein_distance']), [2, 0])
+        self.assertEqual(list(matched['last_levenshtein_distance']), [1, 1])
+        self.assertEqual(list(matched['matched_to']), [1, 3])
+
+    def test_levenshtein_blocking(self):
+        df1, df2 = get_levenshtein_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        fields = [
+            {'field_name': 'first', 'precision': 2},
+            {'field_name': 'last', 'precision': 3}
+        ]
+        unblocked = matcher.levenshtein(fields)
+        self.assertEqual(len(unblocked), 3)
+        blocked = matcher.levenshtein(fields, blocking=lambda row: row['last'][:1])
+        self.assertEqual(len(blocked), 2)
+        self.assertEqual(list(blocked['id1']), [1, 2])
+        self.assertEqual(list(blocked['id2']), [100, 101])
+        with self.assertRaises(AssertionError):
+            matcher.levenshtein(fields, blocking='middle')
+        with self.assertRaises(AssertionError):
+            Matcher.validate_match_criteria([{
+                'method': 'levenshtein',
+                'fields': fields,
+                'blocking': [1]
+            }])
+
+    def test_levenshtein_max_pairs(self):
+        left, right, _ = generate_people(300, 60, typo_rate=0.5, seed=2)
+        matcher = Matcher(left, 'unique_id', right, 'new_id')
+        fields = [
+            {'field_name': 'first_name', 'precision': 1},
+            {'field_name': 'last_name', 'precision': 2}
+        ]
+        for blocking in [None, lambda row: row['zip'][:1]]:
+            expected = matcher.levenshtein(fields, blocking=blocking)
+            for max_pairs in [1, 500]:
+                pd.testing.assert_frame_equal(
+                    matcher.levenshtein(fields, blocking=blocking, max_pairs=max_pairs),
+                    expected
+                )
+        match_types = [{'type_id': 1, 'method': 'levenshtein', 'fields': fields}]
+        expected = matcher.create_matches(match_types)
+        blocked = matcher.create_matches(match_types, max_pairs=500)
+        pd.testing.assert_frame_equal(blocked.positions, expected.positions)
+        counts = ['candidate_pairs', 'length_pruned', 'pairs_kept']
+        pd.testing.assert_frame_equal(blocked.stats[counts], expected.stats[counts])
+        with self.assertRaises(ValueError):
+            matcher.create_matches(match_types, max_pairs=0)
+
+    def test_levenshtein_engines(self):
+        left, right, _ = generate_people(500, 100, typo_rate=0.5, seed=3)
+        matcher = Matcher(left, 'unique_id', right, 'new_id')
+        fields = [
+            {'field_name': 'first_name', 'precision': 2},
+            {'field_name': 'last_name', 'precision': 1}
+        ]
+        for blocking in [None, lambda row: row['zip'][:1]]:
+            brute = matcher.levenshtein(fields, blocking=blocking)
+            self.assertGreater(len(brute), 0)
+            for engine in ['bktree', 'symspell']:
+                searched = matcher.levenshtein(fields, blocking=blocking, engine=engine)
+                pd.testing.assert_frame_equal(searched, brute)
+        with self.assertRaises(AssertionError):
+            Matcher.validate_match_criteria([{'method': 'levenshtein', 'fields': fields, 'engine': 'trie'}])
+
+    def test_levenshtein_distinct_values(self):
+        left, right, _ = generate_people(300, 60, seed=1)
+        matcher = Matcher(left, 'unique_id', right, 'new_id')
+        left_positions, right_positions = matcher._candidate_pairs([{'field_name': 'last_name', 'precision': 2}])
+        left_values = left['last_name'].to_numpy()[left_positions]
+        right_values = right['last_name'].to_numpy()[right_positions]
+        cache = {}
+        distances = matcher._field_distances('last_name', left_positions, right_positions, cache)
+        self.assertEqual(list(distances), [Levenshtein.distance(l, r) for l, r in zip(left_values, right_values)])
+        # Each distinct pair of values is compared once, and not again by later calls sharing the cache.
+        distinct = len(set(zip(left_values, right_values)))
+        self.assertLess(distinct, len(distances))
+        self.assertEqual(len(cache['levenshtein', 'last_name'][1]), distinct)
+        subset = matcher._for_right(right.iloc[::2])
+        subset_positions = np.flatnonzero(right_positions % 2 == 0)
+        subset_distances = subset._field_distances(
+            'last_name', left_positions[subset_positions], right_positions[subset_positions] // 2, cache
+        )
+        self.assertEqual(list(subset_distances), list(distances[subset_positions]))
+        self.assertEqual(len(cache['levenshtein', 'last_name'][1]), distinct)
+
+    def test_levenshtein_bounded_distances(self):
+        left, right, _ = generate_people(300, 60, typo_rate=0.5, seed=4)
+        matcher = Matcher(left, 'unique_id', right, 'new_id')
+        left_positions, right_positions = matcher._candidate_pairs([{'field_name': 'last_name', 'precision': 3}])
+        exact = matcher._field_distances('last_name', left_positions, right_positions)
+        cache = {}
+        bounded = matcher._field_distances('last_name', left_positions, right_positions, cache, limit=1)
+        self.assertTrue(((bounded == exact) | ((bounded > 1) & (exact > 1))).all())
+        # Distances computed subject to a tighter limit are computed again for a looser one.
+        looser = matcher._field_distances('last_name', left_positions, right_positions, cache, limit=3)
+        self.assertTrue(((looser == exact) | ((looser > 3) & (exact > 3))).all())
+        # Matches are identical to comparing every field of every pair of records, whichever precision comes first.
+        crossed = crossjoin_dataframes(left, right)
+        first = crossed.apply(lambda row: Levenshtein.distance(row['first_name_x'], row['first_name_y']), axis=1)
+        last = crossed.apply(lambda row: Levenshtein.distance(row['last_name_x'], row['last_name_y']), axis=1)
+        for first_precision, last_precision in [(2, 1), (1, 2)]:
+            expected = crossed[(first <= first_precision) & (last <= last_precision)]
+            matched = matcher.levenshtein([
+                {'field_name': 'first_name', 'precision': first_precision},
+                {'field_name': 'last_name', 'precision': last_precision}
+            ])
+            self.assertEqual(
+                list(zip(matched['unique_id'], matched['new_id'])),
+                list(zip(expected['unique_id'], expected['new_id']))
+            )
+            self.assertEqual(list(matched['last_name_levenshtein_distance']), list(last[expected.index]))
+
+    def test_phonetic(self):
+        df1, df2 = get_levenshtein_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        matched = matcher.phonetic(['last'])
+        self.assertEqual(list(zip(matched['id1'], matched['id2'])), [(1, 100), (2, 101)])
+        matched = matcher.phonetic(['first', 'last'], 'metaphone')
+        self.assertEqual(list(zip(matched['id1'], matched['id2'])), [(1, 100), (2, 101)])
+        result = matcher.create_matches([
+            {'type_id': 1, 'method': 'phonetic', 'fields': ['first', 'last'], 'algorithm': 'metaphone'}
+        ])
+        self.assertEqual(list(result.pairs['id2']), [100, 101])
+
+    def test_jaro_winkler(self):
+        df1, df2 = get_levenshtein_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        matched = matcher.jaro_winkler([
+            {'field_name': 'first', 'threshold': 0.8},
+            {'field_name': 'last', 'threshold': 0.85}
+        ])
+        self.assertEqual(list(zip(matched['id1'], matched['id2'])), [(1, 100), (3, 102)])
+        self.assertEqual(
+            list(matched['last_jaro_winkler_similarity']),
+            [Levenshtein.jaro_winkler('Smith', 'Smyth'), Levenshtein.jaro_winkler('Mitten', 'Kitten')]
+        )
+        # Matches are identical to comparing every pair of records, however candidates are generated.
+        left, right, _ = generate_people(300, 60, typo_rate=0.5, seed=5)
+        matcher = Matcher(left, 'unique_id', right, 'new_id')
+        fields = [{'field_name': 'first_name', 'threshold': 0.9}, {'field_name': 'last_name', 'threshold': 0.8}]
+        crossed = crossjoin_dataframes(left, right)
+        first = crossed.apply(lambda row: Levenshtein.jaro_winkler(row['first_name_x'], row['first_name_y']), axis=1)
+        last = crossed.apply(lambda row: Levenshtein.jaro_winkler(row['last_name_x'], row['last_name_y']), axis=1)
+        expected = crossed[(first >= 0.9) & (last >= 0.8)]
+        matched = matcher.jaro_winkler(fields)
+        self.assertEqual(
+            sorted(zip(matched['unique_id'], matched['new_id'])),
+            sorted(zip(expected['unique_id'], expected['new_id']))
+        )
+        pd.testing.assert_frame_equal(matcher.jaro_winkler(fields, max_pairs=100), matched)
+
+    def test_ngram_cosine(self):
+        df1 = pd.DataFrame([
+            {'id1': 1, 'first': 'John', 'last': 'Smith'},
+            {'id1': 2, 'first': 'Jon', 'last': 'Smyth'},
+            {'id1': 3, 'first': 'Jane', 'last': 'Jones'},
+        ])
+        df2 = pd.DataFrame([
+            {'id2': 100, 'first': 'Smith', 'last': 'John'},
+            {'id2': 101, 'first': 'Janet', 'last': 'Jones'},
+        ])
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        matched = matcher.ngram_cosine(['first', 'last'], 0.5)
+        # Reordered words still match.
+        self.assertEqual(list(zip(matched['id1'], matched['id2'])), [(1, 100), (3, 101)])
+        self.assertTrue((matched['cosine_similarity'] <= 1).all())
+        self.assertEqual(len(matcher.ngram_cosine(['first', 'last'], 0.1)), 4)
+        best = matcher.ngram_cosine(['first', 'last'], 0.1, top_n=1)
+        self.assertEqual(list(zip(best['id1'], best['id2'])), [(1, 100), (3, 101)])
+        pd.testing.assert_frame_equal(
+            matcher.ngram_cosine(['first', 'last'], 0.1, max_pairs=1),
+            matcher.ngram_cosine(['first', 'last'], 0.1)
+        )
+        blocked = matcher.ngram_cosine(['first', 'last'], 0.1, blocking=lambda row: row['last'][:1])
+        self.assertEqual(list(zip(blocked['id1'], blocked['id2'])), [(3, 101)])
+        result = matcher.create_matches([{
+            'type_id': 1, 'method': 'ngram_cosine', 'fields': ['first', 'last'], 'threshold': 0.1, 'top_n': 1
+        }])
+        self.assertEqual(list(result.pairs['id1']), [1, 3])
+
     def test_multiple_criteria(self):
         df1, df2 = get_levenshtein_data()
         match_types = get_match_types()
@@ -174,6 +510,571 @@ class TestMatcher(unittest.TestCase):
         self.assertEqual(matched.unique_matches.iloc[1]['match_type'], 2)
         self.assertEqual(matched.unique_matches.iloc[2]['match_type'], 3)
 
+    def test_match_result_columns(self):
+        df1, df2 = get_levenshtein_data()
+        matched = Matcher(df1, 'id1', df2, 'id2').create_matches(get_match_types())
+        self.assertEqual(list(matched.positions.columns), ['left_position', 'right_position', 'match_type'])
+        self.assertEqual(list(matched.pairs.columns), ['id1', 'id2', 'match_type'])
+        self.assertEqual(len(matched), 5)
+        subset = matched.with_columns(['last'])
+        self.assertEqual(list(subset.columns), ['id1', 'id2', 'match_type', 'last_x', 'last_y'])
+        self.assertEqual(list(subset['last_x']), ['Mitten', 'Smith', 'Jones', 'Smith', 'Mitten'])
+        with self.assertRaises(ValueError):
+            matched.with_columns(['middle'])
+        self.assertIsNone(matched._matched_data)
+        self.assertEqual(
+            list(matched.matched_data.columns),
+            ['id1', 'id2', 'match_type', 'first_x', 'last_x', 'first_y', 'last_y']
+        )
+        self.assertIs(matched.matched_data, matched.matched_data)
+        pd.testing.assert_frame_equal(matched.to_frame(), matched.matched_data)
+
+    def test_unmatched(self):
+        df1, df2 = get_match_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        matched = matcher.create_matches([{'type_id': 1, 'method': 'exact_match', 'fields': ['field']}])
+        unmatched = matcher.unmatched(matched)
+        self.assertEqual(list(unmatched['id2']), [100, 101])
+        self.assertEqual(list(unmatched.columns), ['field', 'id2'])
+        self.assertIs(matched.unmatched, unmatched)
+        pd.testing.assert_frame_equal(matcher.unmatched(matched.matched_data), unmatched)
+        self.assertIs(matched.unique_matches, matched.unique_matches)
+
+    def test_match_to_multiple(self):
+        df1, df2 = get_levenshtein_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        matched = matcher.create_matches([
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['first']},
+            {'type_id': 2, 'method': 'levenshtein', 'fields': [{'field_name': 'first', 'precision': 2}]}
+        ])
+        report = matcher.match_to_multiple(matched, clusters=True)
+        # Jake matches both Jack and Jane, and Jane matches both Jake and Joan.
+        self.assertEqual(list(zip(report['right_to_many']['id2'], report['right_to_many']['left_count'])), [(100, 2)])
+        self.assertEqual(list(zip(report['left_to_many']['id1'], report['left_to_many']['right_count'])), [(2, 2)])
+        # Jack, Jane, Jake and Joan are linked by a chain of matches; Bob only ever matches Bob.
+        clusters = report['clusters']
+        self.assertEqual(list(clusters.columns), ['cluster', 'id1', 'id2'])
+        self.assertEqual(
+            list(clusters.itertuples(index=False, name=None)),
+            [(0, 1, 100), (0, 2, 100), (0, 2, 101), (1, 3, 102)]
+        )
+        from_frame = matcher.match_to_multiple(matched.matched_data)
+        self.assertNotIn('clusters', from_frame)
+        pd.testing.assert_frame_equal(from_frame['right_to_many'], report['right_to_many'])
+
+        # Chains of matches are followed however long they are.
+        left = pd.DataFrame({'id1': np.arange(1000), 'key': np.arange(1000)})
+        right = pd.DataFrame({'id2': np.arange(1000), 'key': np.arange(1000)})
+        chained = Matcher(left, 'id1', right, 'id2').create_matches([
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['key']},
+            {'type_id': 2, 'method': 'function', 'function': lambda data: data['key'] // 2, 'vectorized': True}
+        ])
+        self.assertEqual(chained.clusters()['cluster'].nunique(), 500)
+        self.assertEqual(len(chained.match_to_multiple()['right_to_many']), 1000)
+
+    def test_deduplicate(self):
+        left, _, _ = generate_people(300, 60, seed=6)
+        people = pd.concat([left, left.sample(60, random_state=1)], ignore_index=True)
+        people['unique_id'] = np.arange(len(people))
+        match_types = [
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['ssn']},
+            {'type_id': 2, 'method': 'levenshtein', 'fields': [
+                {'field_name': 'first_name', 'precision': 1}, {'field_name': 'last_name', 'precision': 1}
+            ]},
+            {'type_id': 3, 'method': 'ngram_cosine', 'fields': ['first_name', 'last_name'], 'threshold': 0.8}
+        ]
+        # Deduplicating finds exactly the pairs found by matching against a copy, each once and never with itself.
+        full = Matcher(people, 'unique_id', people.rename(columns={'unique_id': 'other_id'}), 'other_id')
+        full_pairs = full.create_matches(match_types).pairs
+        expected = full_pairs[full_pairs['unique_id'] < full_pairs['other_id']]
+        matcher = Matcher(people, 'unique_id', None, 'unique_id')
+        deduplicated = matcher.deduplicate(match_types)
+        self.assertTrue(deduplicated.deduplicated)
+        self.assertEqual(list(deduplicated.pairs.columns), ['unique_id', 'unique_id_right', 'match_type'])
+        self.assertEqual(
+            list(deduplicated.pairs.itertuples(index=False, name=None)),
+            list(expected.itertuples(index=False, name=None))
+        )
+        self.assertGreaterEqual(deduplicated.stats['pairs_kept'].iloc[0], 60)
+        full_stats = full.create_matches(match_types).stats
+        self.assertLess(deduplicated.stats['candidate_pairs'].iloc[1], full_stats['candidate_pairs'].iloc[1] / 2)
+        for options in [{'max_pairs': 1000}, {'n_jobs': 2}]:
+            pd.testing.assert_frame_equal(matcher.deduplicate(match_types, **options).pairs, deduplicated.pairs)
+        self.assertNotIn('unique_id_right', people.columns)
+
+        # Chains of duplicates form a single cluster.
+        chain = pd.DataFrame({'id': [1, 2, 3, 4, 5], 'name': ['Ann', 'Anne', 'Annie', 'Bob', 'Ann']})
+        clusters = Matcher(chain, 'id', None, 'id').deduplicate([
+            {'type_id': 1, 'method': 'levenshtein', 'fields': [{'field_name': 'name', 'precision': 1}]}
+        ]).clusters()
+        self.assertEqual(
+            list(clusters.itertuples(index=False, name=None)),
+            [(0, 1, 2), (0, 1, 5), (0, 2, 3), (0, 2, 5)]
+        )
+
+    def test_multiple_criteria_parallel(self):
+        df1, df2 = get_levenshtein_data()
+        match_types = get_match_types()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        serial = matcher.create_matches(match_types)
+        parallel = matcher.create_matches(match_types, n_jobs=2)
+        pd.testing.assert_frame_equal(serial.matched_data, parallel.matched_data)
+        self.assertEqual(list(df1.columns), ['id1', 'first', 'last'])
+
+    def test_top_k(self):
+        df1, df2 = get_levenshtein_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        best = matcher.create_matches(get_match_types(), top_k=1)
+        self.assertEqual(str(best), "< MatchResult: 3 records; id1 to id2 >")
+        self.assertEqual(
+            sorted(best.matched_data[['id1', 'id2', 'match_type']].itertuples(index=False, name=None)),
+            [(1, 100, 3), (2, 101, 3), (3, 102, 1)]
+        )
+        with self.assertRaises(ValueError):
+            matcher.create_matches(get_match_types(), top_k=0)
+
+    def test_top_k_ranks_by_distance(self):
+        df1 = pd.DataFrame([
+            {'id1': 1, 'first': 'Jonny'},
+            {'id1': 2, 'first': 'Jon'},
+            {'id1': 3, 'first': 'John'},
+        ])
+        df2 = pd.DataFrame([
+            {'id2': 100, 'first': 'John'},
+            {'id2': 101, 'first': 'Jon'},
+        ])
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        match_types = [{'type_id': 1, 'method': 'levenshtein', 'fields': [{'field_name': 'first', 'precision': 2}]}]
+        best = matcher.create_matches(match_types, top_k=1).matched_data
+        self.assertEqual(sorted(zip(best['id2'], best['id1'])), [(100, 3), (101, 2)])
+        top_two = matcher.create_matches(match_types, top_k=2).matched_data
+        self.assertEqual(sorted(zip(top_two['id2'], top_two['id1'])), [(100, 2), (100, 3), (101, 2), (101, 3)])
+        parallel = matcher.create_matches(match_types, top_k=2, n_jobs=2).matched_data
+        pd.testing.assert_frame_equal(top_two, parallel)
+
+    def test_cascade(self):
+        df1, df2 = get_levenshtein_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        key_fields = ['id1', 'id2', 'match_type']
+        full = matcher.create_matches(get_match_types())
+        self.assertEqual(
+            list(full.matched_data[key_fields].itertuples(index=False, name=None)),
+            [(3, 102, 1), (1, 100, 3), (2, 101, 3), (1, 100, 2), (3, 102, 2)]
+        )
+        cascaded = matcher.create_matches(get_match_types(), cascade='right')
+        self.assertEqual(
+            list(cascaded.matched_data[key_fields].itertuples(index=False, name=None)),
+            [(3, 102, 1), (1, 100, 3), (2, 101, 3)]
+        )
+        # Later match types only consider the records still unmatched.
+        self.assertEqual(list(cascaded.stats['candidate_pairs']), [1, 2, 0])
+        parallel = matcher.create_matches(get_match_types(), cascade='right', n_jobs=2)
+        pd.testing.assert_frame_equal(parallel.matched_data, cascaded.matched_data)
+
+        match_types = [
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['first']},
+            {'type_id': 2, 'method': 'levenshtein', 'fields': [{'field_name': 'last', 'precision': 6}]}
+        ]
+        right = matcher.create_matches(match_types, cascade='right').pairs
+        self.assertEqual(
+            sorted(zip(right['id1'], right['id2'])),
+            [(1, 100), (1, 101), (2, 100), (2, 101), (3, 100), (3, 101), (3, 102)]
+        )
+        both = matcher.create_matches(match_types, cascade='both').pairs
+        self.assertEqual(sorted(zip(both['id1'], both['id2'])), [(1, 100), (1, 101), (2, 100), (2, 101), (3, 102)])
+        with self.assertRaises(ValueError):
+            matcher.create_matches(match_types, cascade='left')
+        with self.assertRaises(ValueError):
+            matcher.create_matches(match_types, cascade='both', n_jobs=2)
+
+    def test_stats_and_hooks(self):
+        df1, df2 = get_levenshtein_data()
+        matcher = Matcher(df1, 'id1', df2, 'id2')
+        events = []
+        matcher.register_hook('on_criterion_start', lambda match_type: events.append(('start', match_type['type_id'])))
+        matcher.register_hook('on_criterion_end', lambda match_type, stats: events.append(('end', stats['pairs_kept'])))
+        with self.assertRaises(ValueError):
+            matcher.register_hook('on_finish', print)
+        matched = matcher.create_matches(get_match_types())
+        self.assertEqual(events, [('start', 1), ('end', 1), ('start', 3), ('end', 2), ('start', 2), ('end', 2)])
+        stats = matched.stats
+        self.assertEqual(list(stats['type_id']), [1, 3, 2])
+        self.assertEqual(list(stats['method']), ['exact_match', 'function', 'levenshtein'])
+        self.assertEqual(list(stats['pairs_kept']), [1, 2, 2])
+        # Every pair of names is close enough in length to be compared.
+        self.assertEqual(stats['candidate_pairs'].iloc[2], 9)
+        self.assertEqual(stats['length_pruned'].iloc[2], 0)
+        self.assertTrue((stats['wall_seconds'] >= 0).all())
+
+        chunks = []
+        matcher.register_hook('on_chunk', lambda chunk_number, stats: chunks.append(chunk_number))
+        parallel = matcher.create_matches(get_match_types(), n_jobs=2)
+        pd.testing.assert_frame_equal(
+            parallel.stats.drop(['wall_seconds', 'peak_memory_delta_mb'], axis=1),
+            stats.drop(['wall_seconds', 'peak_memory_delta_mb'], axis=1)
+        )
+        self.assertEqual(chunks, [0, 1, 2])
+        chunks = []
+        list(matcher.iter_matches(get_match_types(), [df2.iloc[:1], df2.iloc[1:]]))
+        self.assertEqual(chunks, [0, 1])
+
+    def test_update_matches(self):
+        df1, df2 = get_levenshtein_data()
+        match_types = get_match_types()
+        previous = Matcher(df1, 'id1', df2, 'id2').create_matches(match_types)
+        new_df1 = pd.concat([
+            df1[df1['id1'] != 2],
+            pd.DataFrame([{'id1': 4, 'first': 'Joan', 'last': 'Jeans'}])
+        ], ignore_index=True)
+        new_df1.loc[new_df1['id1'] == 3, 'last'] = 'Mittens'
+        new_df2 = df2.copy()
+        new_df2.loc[new_df2['id2'] == 100, 'first'] = 'Jack'
+        matcher = Matcher(new_df1, 'id1', new_df2, 'id2')
+        left_changes = {'inserted': [4], 'updated': [3], 'deleted': [2]}
+        right_changes = {'updated': [100]}
+        for top_k in [None, 1]:
+            expected = matcher.create_matches(match_types, top_k=top_k)
+            if top_k is not None:
+                previous = Matcher(df1, 'id1', df2, 'id2').create_matches(match_types, top_k=top_k)
+            updated = matcher.update_matches(previous, match_types, left_changes, right_changes, top_k=top_k)
+            pd.testing.assert_frame_equal(updated.positions, expected.positions)
+            pd.testing.assert_frame_equal(updated.matched_data, expected.matched_data)
+        with self.assertRaises(ValueError):
+            matcher.update_matches(previous, match_types, {'inserted': [2]})
+        with self.assertRaises(ValueError):
+            matcher.update_matches(previous, match_types, {'changed': [3]})
+
+        for cascade in ['right', 'both']:
+            previous = Matcher(df1, 'id1', df2, 'id2').create_matches(match_types, cascade=cascade)
+            updated = matcher.update_matches(previous, match_types, left_changes, right_changes, cascade=cascade)
+            pd.testing.assert_frame_equal(
+                updated.positions, matcher.create_matches(match_types, cascade=cascade).positions
+            )
+        with self.assertRaises(ValueError):
+            matcher.update_matches(previous, match_types, left_changes, cascade='left')
+
+        # ngram_cosine is not symmetric, so is performed afresh whenever left_data changes, including when records
+        # are only deleted.
+        left, right, _ = generate_people(400, 100, typo_rate=0.5, seed=11)
+        updated_left = left.copy()
+        updated_left.loc[:19, 'last_name'] = left['last_name'].iloc[20:40].to_numpy()
+        changes = [
+            (updated_left, {'updated': left['unique_id'].iloc[:20].tolist()}),
+            (left.iloc[20:].reset_index(drop=True), {'deleted': left['unique_id'].iloc[:20].tolist()}),
+        ]
+        for new_left, left_changes in changes:
+            matcher = Matcher(new_left, 'unique_id', right, 'new_id')
+            for top_n, top_k in [(None, None), (1, None), (None, 1)]:
+                ngram_types = [
+                    {'type_id': 1, 'method': 'exact_match', 'fields': ['ssn']},
+                    {'type_id': 2, 'method': 'ngram_cosine', 'fields': ['first_name', 'last_name'],
+                     'threshold': 0.6, 'top_n': top_n},
+                ]
+                previous = Matcher(left, 'unique_id', right, 'new_id').create_matches(ngram_types, top_k=top_k)
+                updated = matcher.update_matches(previous, ngram_types, left_changes, top_k=top_k)
+                pd.testing.assert_frame_equal(
+                    updated.positions, matcher.create_matches(ngram_types, top_k=top_k).positions
+                )
+
+    def test_iter_matches(self):
+        df1, df2 = get_levenshtein_data()
+        match_types = get_match_types()
+        full = Matcher(df1, 'id1', df2, 'id2').create_matches(match_types)
+        matcher = Matcher(df1, 'id1', None, 'id2')
+        chunks = [df2.iloc[:1], df2.iloc[1:].to_dict('records')]
+        results = list(matcher.iter_matches(match_types, chunks))
+        self.assertEqual(len(results), 2)
+        self.assertEqual(str(results[0]), "< MatchResult: 2 records; id1 to id2 >")
+        self.assertEqual(str(results[1]), "< MatchResult: 3 records; id1 to id2 >")
+        key_fields = ['id1', 'id2', 'match_type']
+        combined = pd.concat([result.matched_data[key_fields] for result in results])
+        self.assertEqual(
+            sorted(combined.itertuples(index=False)),
+            sorted(full.matched_data[key_fields].itertuples(index=False))
+        )
+        # Indexes on left_data are built once, then shared by every chunk.
+        self.assertEqual(len(matcher.left_index.key_indexes), 3)
+        self.assertEqual(len(matcher.left_index.strings), 2)
+
+    def test_concurrent_matching(self):
+        left, right, _ = generate_people(500, 200, typo_rate=0.5, seed=8)
+        match_types = [
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['ssn']},
+            {'type_id': 2, 'method': 'function', 'function': lambda row: row['first_name'][:2] + row['zip']},
+            {'type_id': 3, 'method': 'levenshtein', 'fields': [
+                {'field_name': 'first_name', 'precision': 1}, {'field_name': 'last_name', 'precision': 1}
+            ], 'engine': 'symspell'}
+        ]
+        fields = [dict(field) for field in match_types[2]['fields']]
+        matcher = Matcher(left, 'unique_id', None, 'new_id', intern=['first_name', 'last_name'])
+        batches = [right.iloc[start:start + 10] for start in range(0, len(right), 10)]
+        expected = [
+            Matcher(left, 'unique_id', batch, 'new_id').create_matches(match_types).pairs for batch in batches
+        ]
+        # Indexes on left_data are built by whichever thread first needs them, and shared by every other.
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda batch: matcher.create_matches(match_types, right_data=batch), batches))
+        for result, batch_expected in zip(results, expected):
+            pd.testing.assert_frame_equal(result.pairs, batch_expected)
+        self.assertEqual(len(matcher.right_data), 0)
+        self.assertEqual(match_types[2]['fields'], fields)
+        self.assertEqual(len(matcher.left_index.search_indexes), 1)
+        Matcher(left, 'unique_id', right, 'new_id').levenshtein(match_types[2]['fields'])
+        self.assertEqual(match_types[2]['fields'], fields)
+
+    def test_match_one(self):
+        left, right, _ = generate_people(1000, 60, typo_rate=0.5, seed=9)
+        match_types = [
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['first_name', 'last_name', 'dob']},
+            {'type_id': 2, 'method': 'function', 'function': lambda row: row['first_name'][:1] + row['zip']},
+            {
+                'type_id': 3,
+                'method': 'function',
+                'function': lambda data: data['last_name'].str[:3] + data['zip'].str[:2],
+                'vectorized': True
+            },
+            {'type_id': 4, 'method': 'levenshtein', 'fields': [
+                {'field_name': 'first_name', 'precision': 1}, {'field_name': 'last_name', 'precision': 2}
+            ]},
+            {
+                'type_id': 5,
+                'method': 'levenshtein',
+                'fields': [{'field_name': 'first_name', 'precision': 2}],
+                'blocking': lambda row: row['zip'][:1],
+                'engine': 'bktree'
+            },
+            {'type_id': 6, 'method': 'phonetic', 'fields': ['first_name', 'last_name']},
+            {'type_id': 7, 'method': 'jaro_winkler', 'fields': [
+                {'field_name': 'first_name', 'threshold': 0.85}, {'field_name': 'last_name', 'threshold': 0.9}
+            ]},
+            {'type_id': 8, 'method': 'ngram_cosine', 'fields': ['first_name', 'last_name'], 'threshold': 0.5,
+             'top_n': 2},
+            {'type_id': 9, 'method': 'ngram_cosine', 'fields': ['last_name'], 'threshold': 0.4, 'top_n': 1,
+             'blocking': 'dob'},
+        ]
+        matcher = Matcher(left, 'unique_id', None, 'new_id', intern=['first_name', 'last_name'])
+        matcher.left_index.prepare(match_types, lookup=True)
+        self.assertEqual(len(matcher.left_index.key_lookups), 6)
+        # Each record is matched exactly as create_matches would match it alone.
+        for record in right.to_dict('records'):
+            expected = matcher.create_matches(match_types, right_data=[record]).pairs
+            self.assertEqual(
+                matcher.match_one(record, match_types),
+                list(zip(expected['unique_id'].tolist(), expected['match_type'].tolist()))
+            )
+
+        # Records missing a compared value, on either side, are matched by neither, rather than failing.
+        left.loc[:4, 'last_name'] = [None, np.nan, None, np.nan, None]
+        right.loc[:4, 'first_name'] = [None, np.nan, None, np.nan, None]
+        similar_types = [
+            match_type for match_type in match_types if match_type['method'] in ['levenshtein', 'jaro_winkler']
+        ]
+        matcher = Matcher(left, 'unique_id', None, 'new_id')
+        for options in [{}, {'max_pairs': 100}]:
+            expected = matcher.create_matches(similar_types, right_data=right, **options).pairs
+            self.assertFalse(expected['unique_id'].isin(left['unique_id'].iloc[:5]).any())
+            self.assertFalse(expected['new_id'].isin(right['new_id'].iloc[:5]).any())
+            self.assertEqual(
+                sorted(
+                    (left_id, record['new_id'], match_type)
+                    for record in right.to_dict('records')
+                    for left_id, match_type in matcher.match_one(record, similar_types)
+                ),
+                sorted(expected.itertuples(index=False, name=None))
+            )
+
+    def test_match_service(self):
+        left, right, _ = generate_people(1000, 60, typo_rate=0.5, seed=10)
+        match_types = [
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['first_name', 'last_name', 'dob']},
+            {'type_id': 2, 'method': 'function', 'function': lambda row: row['first_name'][:1] + row['zip']},
+            {'type_id': 3, 'method': 'levenshtein', 'fields': [
+                {'field_name': 'first_name', 'precision': 1}, {'field_name': 'last_name', 'precision': 2}
+            ]},
+        ]
+        matcher = Matcher(left, 'unique_id', None, 'new_id')
+        records = right.to_dict('records')
+        expected = [matcher.match_one(record, match_types) for record in records]
+
+        async def serve(service):
+            async with service:
+                # Single records and small batches, all arriving at once.
+                singles = asyncio.gather(*(service.match_one(record) for record in records[:40]))
+                batches = asyncio.gather(*(service.match(records[i:i + 5]) for i in range(40, 60, 5)))
+                empty = await service.match([])
+                singles, batches = await singles, await batches
+            return singles + [matches for batch in batches for matches in batch], empty
+
+        service = MatchService(matcher, match_types, max_batch_size=25, max_wait=1)
+        matches, empty = asyncio.run(serve(service))
+        self.assertEqual(matches, expected)
+        self.assertEqual(empty, [])
+        self.assertEqual((service.requests, service.records, service.batches), (45, 60, 3))
+
+        executor = MatchService.process_pool(matcher, match_types, max_workers=1)
+        with executor:
+            matches, _ = asyncio.run(serve(MatchService(matcher, match_types, executor=executor)))
+        self.assertEqual(matches, expected)
+
+        # Every request in a batch receives the error raised in matching it.
+        async def fail():
+            async with MatchService(matcher, match_types) as service:
+                return await asyncio.gather(
+                    service.match_one({'first_name': 'Jake'}), service.match_one(records[0]), return_exceptions=True
+                )
+        self.assertTrue(all(isinstance(result, Exception) for result in asyncio.run(fail())))
+        with self.assertRaises(ValueError):
+            MatchService(matcher, match_types, max_batch_size=0)
+
+        # Closing the service matches a request still waiting for others to join its batch.
+        async def close_while_waiting():
+            service = MatchService(matcher, match_types, max_wait=0.5)
+            request = asyncio.ensure_future(service.match_one(records[0]))
+            await asyncio.sleep(0.05)
+            await service.close()
+            return await asyncio.wait_for(request, 2)
+        self.assertEqual(asyncio.run(close_while_waiting()), expected[0])
+
+    def test_intern(self):
+        df1, df2 = get_levenshtein_data()
+        df2.loc[2, 'first'] = 'Robert'
+        match_types = get_match_types()
+        expected = Matcher(df1, 'id1', df2, 'id2').create_matches(match_types)
+        matcher = Matcher(df1, 'id1', df2, 'id2', intern=['first', 'last'])
+        self.assertIsInstance(matcher.left_data['first'].dtype, pd.CategoricalDtype)
+        # Values held only by right_data extend the vocabulary of left_data.
+        self.assertEqual(
+            list(matcher.right_data['first'].cat.categories),
+            ['Jack', 'Jane', 'Bob', 'Jake', 'Joan', 'Robert']
+        )
+        self.assertNotIsInstance(df1['first'].dtype, pd.CategoricalDtype)
+        matched = matcher.create_matches(match_types)
+        pd.testing.assert_frame_equal(matched.matched_data, expected.matched_data)
+        pd.testing.assert_frame_equal(matched.unmatched, expected.unmatched)
+        with self.assertRaises(ValueError):
+            Matcher(df1, 'id1', df2, 'id2', intern=['middle'])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_columnar_files(self):
+        df1, df2 = get_levenshtein_data()
+        df1['notes'] = ['a', 'b', 'c']
+        match_types = get_match_types()
+        expected = Matcher(df1, 'id1', df2, 'id2').create_matches(match_types)
+        with tempfile.TemporaryDirectory() as directory:
+            left_path = os.path.join(directory, 'left.parquet')
+            right_path = os.path.join(directory, 'right.arrow')
+            pyarrow.parquet.write_table(pyarrow.Table.from_pandas(df1), left_path, row_group_size=2)
+            pyarrow.feather.write_feather(df2, right_path)
+            matcher = Matcher(left_path, 'id1', right_path, 'id2', columns=['first', 'last'])
+            # Columns not used for matching are only read for matched records.
+            self.assertNotIn('notes', matcher.left_data.columns)
+            matched = matcher.create_matches(match_types)
+            pd.testing.assert_frame_equal(matched.matched_data, expected.matched_data, check_dtype=False)
+            output_path = os.path.join(directory, 'matches.parquet')
+            matched.to_parquet(output_path, ['notes'], batch_size=2)
+            pd.testing.assert_frame_equal(
+                pd.read_parquet(output_path),
+                expected.with_columns(['notes']),
+                check_dtype=False
+            )
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_to_parquet_types(self):
+        left = pd.DataFrame({'id1': [1, 2, 3], 'name': ['Ann', 'Bob', 'Cat'], 'notes': [None, None, 'x']})
+        right = pd.DataFrame({'id2': [10, 20, 30], 'name': ['Ann', 'Bob', 'Cat']})
+        match_types = [
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['name']},
+            {'method': 'function', 'function': lambda row: row['name'][:1]},
+        ]
+        result = Matcher(left, 'id1', right, 'id2', intern=['name']).create_matches(match_types)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'matches.parquet')
+            # Batches holding only missing notes, or only match types without a type_id, share the same types.
+            result.to_parquet(path, ['notes', 'name'], batch_size=1)
+            written = pyarrow.parquet.read_table(path)
+            for column in ['notes', 'name_x']:
+                column_type = written.schema.field(column).type
+                self.assertTrue(pyarrow.types.is_string(column_type) or pyarrow.types.is_large_string(column_type))
+            self.assertTrue(pyarrow.types.is_integer(written.schema.field('match_type').type))
+            # Missing match types are read back as NaN.
+            expected = result.with_columns(['notes', 'name'])
+            pd.testing.assert_frame_equal(
+                written.to_pandas().astype({'match_type': 'Int64'}),
+                expected.astype({'match_type': 'Int64'}),
+                check_dtype=False
+            )
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_deduplicate_columnar_file(self):
+        people = pd.DataFrame({'id': [10, 20, 30], 'name': ['Ann', 'Anne', 'Bob'], 'notes': ['a', 'b', 'c']})
+        match_types = [{'type_id': 1, 'method': 'levenshtein', 'fields': [{'field_name': 'name', 'precision': 1}]}]
+        expected = Matcher(people, 'id', None, 'id').deduplicate(match_types)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'people.parquet')
+            pyarrow.parquet.write_table(pyarrow.Table.from_pandas(people), path)
+            deduplicated = Matcher(path, 'id', None, 'id', columns=['name']).deduplicate(match_types)
+            # The id of the right record of each pair is read from the file under its suffixed name.
+            self.assertEqual(list(deduplicated.matched_data[['id', 'id_right']].itertuples(index=False)), [(10, 20)])
+            pd.testing.assert_frame_equal(deduplicated.matched_data, expected.matched_data, check_dtype=False)
+            pd.testing.assert_frame_equal(
+                deduplicated.with_columns(['notes']), expected.with_columns(['notes']), check_dtype=False
+            )
+
+    def test_left_index(self):
+        df1, df2 = get_levenshtein_data()
+        match_types = [
+            {'type_id': 1, 'method': 'exact_match', 'fields': ['first']},
+            {'type_id': 3, 'method': 'function', 'function': initials},
+            {
+                'type_id': 2,
+                'method': 'levenshtein',
+                'fields': [{'field_name': 'first', 'precision': 2}, {'field_name': 'last', 'precision': 1}],
+                'blocking': initials
+            },
+        ]
+        expected = Matcher(df1, 'id1', df2, 'id2').create_matches(match_types)
+        index = LeftIndex(df1, match_types)
+        self.assertEqual(str(index), "< LeftIndex: 3 records; 3 key indexes; 2 string fields >")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'population.idx')
+            index.save(path)
+            loaded = LeftIndex.load(path)
+        matcher = Matcher(None, 'id1', df2, 'id2', left_index=loaded)
+        pd.testing.assert_frame_equal(matcher.create_matches(match_types).matched_data, expected.matched_data)
+        self.assertEqual(len(loaded.key_indexes), 3)
+        with self.assertRaises(ValueError):
+            Matcher(df1.iloc[:2], 'id1', df2, 'id2', left_index=loaded)
+        # Indexes saved by another version are rejected.
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'population.idx')
+            with mock.patch.object(LeftIndex, 'FORMAT_VERSION', 0):
+                index.save(path)
+            with self.assertRaises(ValueError):
+                LeftIndex.load(path)
+
+
+class TestBenchmarkData(unittest.TestCase):
+
+    def test_generate_people(self):
+        left, right, truth = generate_people(200, 50, duplicate_rate=0.5, typo_rate=0.0, seed=7)
+        self.assertEqual(len(left), 200)
+        self.assertEqual(len(right), 50)
+        self.assertTrue(left['unique_id'].is_unique)
+        self.assertTrue(right['new_id'].is_unique)
+        again = generate_people(200, 50, duplicate_rate=0.5, typo_rate=0.0, seed=7)
+        pd.testing.assert_frame_equal(right, again[1])
+        # Without typos, every duplicate is an exact copy of its source record.
+        matcher = Matcher(left, 'unique_id', right, 'new_id')
+        matched = matcher.create_matches([{'type_id': 1, 'method': 'exact_match', 'fields': ['ssn', 'dob']}])
+        self.assertEqual(
+            set(matched.pairs[['unique_id', 'new_id']].itertuples(index=False, name=None)),
+            set(truth.itertuples(index=False, name=None))
+        )
+
+
+def initials(row):
+    return row['first'][:1] + row['last'][:1]
+
 
 def get_lists_of_lists():
     list1 = [